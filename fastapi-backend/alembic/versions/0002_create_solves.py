@@ -0,0 +1,71 @@
+"""create solves table and backfill from challenges.solved_by
+
+Revision ID: 0002_create_solves
+Revises: 0001_create_core_tables
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0002_create_solves'
+down_revision = '0001_create_core_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'solves',
+        sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column('user_id', sa.BigInteger(), sa.ForeignKey('users.id', ondelete='CASCADE', name='fk_solves_user'), nullable=False),
+        sa.Column('team_id', sa.BigInteger(), sa.ForeignKey('teams.id', ondelete='SET NULL', name='fk_solves_team'), nullable=True),
+        sa.Column('challenge_id', sa.BigInteger(), sa.ForeignKey('challenges.id', ondelete='CASCADE', name='fk_solves_challenge'), nullable=False),
+        sa.Column('solved_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.UniqueConstraint('user_id', 'challenge_id', name='uq_solves_user_challenge'),
+    )
+    op.create_index('ix_solves_challenge', 'solves', ['challenge_id'])
+    op.create_index('ix_solves_team', 'solves', ['team_id'])
+
+    # Backfill from the legacy JSON blob where it exists. The column itself is
+    # left in place so this revision can be rolled back without data loss.
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    challenge_columns = {column['name'] for column in inspector.get_columns('challenges')}
+    submission_columns = {column['name'] for column in inspector.get_columns('submissions')}
+    if 'solved_by' not in challenge_columns:
+        return
+
+    # The solve time comes from the first correct submission. The application
+    # reads is_correct, while 0001 and schema.sql create correct; with neither,
+    # the backfill time stands in.
+    correct_column = next((name for name in ('is_correct', 'correct') if name in submission_columns), None)
+    if correct_column:
+        solved_at = (
+            "COALESCE((SELECT MIN(s.created_at) FROM submissions s "
+            f"WHERE s.user_id = u.id AND s.challenge_id = :challenge_id AND s.{correct_column} = 1), "
+            "CURRENT_TIMESTAMP)"
+        )
+    else:
+        solved_at = "CURRENT_TIMESTAMP"
+    backfill = sa.text(
+        "INSERT IGNORE INTO solves (user_id, team_id, challenge_id, solved_at) "
+        f"SELECT u.id, u.team_id, :challenge_id, {solved_at} "
+        "FROM users u WHERE u.id IN :user_ids"
+    ).bindparams(sa.bindparam('user_ids', expanding=True))
+
+    rows = bind.execute(sa.text("SELECT id, solved_by FROM challenges WHERE solved_by IS NOT NULL")).fetchall()
+    for challenge_id, solved_by in rows:
+        try:
+            user_ids = [int(user_id) for user_id in json.loads(solved_by)]
+        except (TypeError, ValueError):
+            continue
+        if user_ids:
+            bind.execute(backfill, {"challenge_id": challenge_id, "user_ids": user_ids})
+
+
+def downgrade():
+    op.drop_table('solves')
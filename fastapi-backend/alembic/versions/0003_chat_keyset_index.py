@@ -0,0 +1,22 @@
+"""add (created_at, id) index for chat keyset pagination
+
+Revision ID: 0003_chat_keyset_index
+Revises: 0002_create_solves
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0003_chat_keyset_index'
+down_revision = '0002_create_solves'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_chat_created_id', 'chat_messages', ['created_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_chat_created_id', table_name='chat_messages')
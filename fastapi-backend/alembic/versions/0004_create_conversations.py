@@ -0,0 +1,52 @@
+"""create conversations index and backfill from private messages
+
+Revision ID: 0004_create_conversations
+Revises: 0003_chat_keyset_index
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0004_create_conversations'
+down_revision = '0003_chat_keyset_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'conversations',
+        sa.Column('user_id', sa.BigInteger(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('partner_id', sa.BigInteger(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('last_message_id', sa.BigInteger(), sa.ForeignKey('chat_messages.id', ondelete='SET NULL'), nullable=True),
+        sa.Column('last_message_at', sa.DateTime(), nullable=True),
+        sa.Column('unread_count', sa.Integer(), nullable=False, server_default=sa.text('0')),
+    )
+    op.create_index('ix_conversations_user_last', 'conversations', ['user_id', 'last_message_at'])
+
+    # Backfill from existing private messages where the chat table has them.
+    # History is treated as read, so unread counters start at zero.
+    bind = op.get_bind()
+    columns = {column['name'] for column in sa.inspect(bind).get_columns('chat_messages')}
+    if not {'sender_id', 'recipient_id', 'is_private', 'is_deleted'} <= columns:
+        return
+
+    op.execute(
+        "INSERT INTO conversations (user_id, partner_id, last_message_id, last_message_at, unread_count) "
+        "SELECT pairs.user_id, pairs.partner_id, m.id, m.created_at, 0 "
+        "FROM ("
+        "  SELECT user_id, partner_id, MAX(id) AS last_id FROM ("
+        "    SELECT sender_id AS user_id, recipient_id AS partner_id, id FROM chat_messages "
+        "    WHERE is_private = 1 AND is_deleted = 0 AND recipient_id IS NOT NULL "
+        "    UNION ALL "
+        "    SELECT recipient_id, sender_id, id FROM chat_messages "
+        "    WHERE is_private = 1 AND is_deleted = 0 AND recipient_id IS NOT NULL"
+        "  ) AS sides GROUP BY user_id, partner_id"
+        ") AS pairs JOIN chat_messages m ON m.id = pairs.last_id"
+    )
+
+
+def downgrade():
+    op.drop_table('conversations')
@@ -0,0 +1,49 @@
+"""create wave_scores and backfill from correct submissions
+
+Revision ID: 0005_create_wave_scores
+Revises: 0004_create_conversations
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0005_create_wave_scores'
+down_revision = '0004_create_conversations'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'wave_scores',
+        sa.Column('wave', sa.String(100), primary_key=True),
+        sa.Column('entity_type', sa.String(10), primary_key=True),
+        sa.Column('entity_id', sa.BigInteger(), primary_key=True),
+        sa.Column('points', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('solves', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('last_solve', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_wave_scores_rank', 'wave_scores', ['wave', 'entity_type', 'points', 'solves', 'last_solve'])
+
+    # Backfill where challenges carry a wave and submissions record points
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    challenge_columns = {column['name'] for column in inspector.get_columns('challenges')}
+    submission_columns = {column['name'] for column in inspector.get_columns('submissions')}
+    if 'wave' not in challenge_columns or not {'is_correct', 'points_awarded', 'team_id'} <= submission_columns:
+        return
+
+    for entity_type, entity_column in (('user', 's.user_id'), ('team', 's.team_id')):
+        op.execute(
+            "INSERT INTO wave_scores (wave, entity_type, entity_id, points, solves, last_solve) "
+            f"SELECT c.wave, '{entity_type}', {entity_column}, SUM(s.points_awarded), COUNT(*), MAX(s.created_at) "
+            "FROM submissions s JOIN challenges c ON c.id = s.challenge_id "
+            f"WHERE s.is_correct = 1 AND c.wave IS NOT NULL AND {entity_column} IS NOT NULL "
+            f"GROUP BY c.wave, {entity_column}"
+        )
+
+
+def downgrade():
+    op.drop_table('wave_scores')
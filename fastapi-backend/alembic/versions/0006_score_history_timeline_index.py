@@ -0,0 +1,46 @@
+"""add (team_id, created_at, delta) index for the score timeline and backfill solves
+
+Revision ID: 0006_score_history_timeline_index
+Revises: 0005_create_wave_scores
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0006_score_history_timeline_index'
+down_revision = '0005_create_wave_scores'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_score_history_team_time', 'score_history', ['team_id', 'created_at', 'delta'])
+
+    # Solves were only logged to score_history from this release on; replay
+    # the correct submissions made before the first logged one
+    bind = op.get_bind()
+    submission_columns = {column['name'] for column in sa.inspect(bind).get_columns('submissions')}
+    if not {'is_correct', 'points_awarded', 'team_id'} <= submission_columns:
+        return
+
+    first_logged = bind.execute(
+        sa.text("SELECT MIN(created_at) FROM score_history WHERE reason LIKE 'solve:%'")
+    ).scalar()
+    bind.execute(
+        sa.text(
+            "INSERT INTO score_history (team_id, delta, reason, created_at) "
+            "SELECT s.team_id, s.points_awarded, CONCAT('solve:', s.challenge_id), s.created_at "
+            "FROM submissions s "
+            "WHERE s.is_correct = 1 AND s.team_id IS NOT NULL AND s.points_awarded IS NOT NULL "
+            "AND (:first_logged IS NULL OR s.created_at < :first_logged) "
+            "ORDER BY s.created_at, s.id"
+        ),
+        {"first_logged": first_logged}
+    )
+
+
+def downgrade():
+    # Backfilled rows are indistinguishable from logged ones and are kept
+    op.drop_index('ix_score_history_team_time', table_name='score_history')
@@ -1,16 +1,13 @@
 import redis
 import json
+import time
+import uuid
 from typing import Any, Optional
 from ..core.config import settings
 
 class RedisClient:
     def __init__(self):
-        self.client = redis.Redis(
-            host=settings.REDIS_HOST,
-            port=settings.REDIS_PORT,
-            db=settings.REDIS_DB,
-            decode_responses=True
-        )
+        self.client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
 
     def get(self, key: str) -> Optional[str]:
         return self.client.get(key)
@@ -32,6 +29,29 @@ class RedisClient:
     def expire(self, key: str, time: int) -> bool:
         return self.client.expire(key, time)
 
+    def pipeline(self, transaction: bool = True):
+        return self.client.pipeline(transaction=transaction)
+
+    # Sorted sets
+    def zincrby(self, key: str, amount: float, member: Any) -> float:
+        return self.client.zincrby(key, amount, member)
+
+    def zrevrange(self, key: str, start: int, end: int, withscores: bool = False):
+        return self.client.zrevrange(key, start, end, withscores=withscores)
+
+    def zrevrangebyscore(self, key: str, max_score: float, min_score: float, withscores: bool = False):
+        return self.client.zrevrangebyscore(key, max_score, min_score, withscores=withscores)
+
+    def zrevrank(self, key: str, member: Any) -> Optional[int]:
+        return self.client.zrevrank(key, member)
+
+    def zscore(self, key: str, member: Any) -> Optional[float]:
+        return self.client.zscore(key, member)
+
+    # Hashes
+    def hmget(self, key: str, fields: list) -> list:
+        return self.client.hmget(key, fields)
+
     def publish(self, channel: str, message: Any) -> int:
         if isinstance(message, (dict, list)):
             message = json.dumps(message)
@@ -77,6 +97,29 @@ class RateLimiter:
         current = int(self.redis.get(key) or 0)
         return max(0, limit - current)
 
+    def is_allowed_sliding(self, key: str, limit: int, window: int, member: Optional[str] = None) -> bool:
+        """Sliding-window log: at most `limit` accepted hits in any `window` seconds.
+
+        The hit is logged under `member` (generated when omitted) and removed
+        again if it is over the limit, so rejected requests do not count.
+        """
+        now = time.time()
+        member = member or f"{now}:{uuid.uuid4().hex[:8]}"
+        pipe = self.redis.pipeline()
+        pipe.zremrangebyscore(key, 0, now - window)
+        pipe.zadd(key, {member: now})
+        pipe.zcard(key)
+        pipe.expire(key, window)
+        _, _, current, _ = pipe.execute()
+        if current > limit:
+            self.release_sliding(key, member)
+            return False
+        return True
+
+    def release_sliding(self, key: str, member: str):
+        """Drop a logged hit, e.g. when another limit rejected the request"""
+        self.redis.client.zrem(key, member)
+
 # Session management
 class SessionManager:
     def __init__(self, redis_client: RedisClient):
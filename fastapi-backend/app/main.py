@@ -2,7 +2,9 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .core.config import settings
 from .core.database import create_tables
-from .routes import auth, users, challenges, teams, scoreboard, messages, gamification
+from .routes import auth, users, challenges, teams, scoreboard, messages, gamification, metrics
+from .utils.broadcast import manager
+from .utils.scoreboard_push import scoreboard_pusher
 
 app = FastAPI(
     title="Money Heist CTF API",
@@ -26,11 +28,20 @@ app.include_router(challenges, prefix="/api/challenges", tags=["Challenges"])
 app.include_router(teams, prefix="/api/teams", tags=["Teams"])
 app.include_router(scoreboard, prefix="/api/scoreboard", tags=["Scoreboard"])
 app.include_router(messages, prefix="/api/messages", tags=["Messages"])
+app.include_router(metrics, prefix="/api/metrics", tags=["Metrics"])
 
 @app.on_event("startup")
 async def startup_event():
     # Create database tables
     create_tables()
+    # Fan chat messages out from Redis to this worker's WebSockets
+    manager.start()
+    scoreboard_pusher.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await scoreboard_pusher.stop()
+    await manager.stop()
 
 @app.get("/")
 async def root():
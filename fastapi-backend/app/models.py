@@ -122,8 +122,28 @@ class Submission(Base):
     challenge = relationship("Challenge")
 
 
+class Solve(Base):
+    __tablename__ = "solves"
+    __table_args__ = (
+        UniqueConstraint("user_id", "challenge_id", name="uq_solves_user_challenge"),
+        Index("ix_solves_challenge", "challenge_id"),
+        Index("ix_solves_team", "team_id"),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    team_id = Column(BigInteger, ForeignKey("teams.id", ondelete="SET NULL"), nullable=True)
+    challenge_id = Column(BigInteger, ForeignKey("challenges.id", ondelete="CASCADE"), nullable=False)
+    solved_at = Column(DateTime(timezone=False), server_default=func.now())
+
+    user = relationship("User")
+    challenge = relationship("Challenge")
+
+
 class ScoreHistory(Base):
     __tablename__ = "score_history"
+    __table_args__ = (Index("ix_score_history_team_time", "team_id", "created_at", "delta"),)
+
     id = Column(BigInteger, primary_key=True, autoincrement=True)
     team_id = Column(BigInteger, index=True)
     delta = Column(Integer)
@@ -153,6 +173,9 @@ class HintRequest(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index("ix_chat_created_id", "created_at", "id"),
+    )
     id = Column(BigInteger, primary_key=True, autoincrement=True)
     team_id = Column(BigInteger, ForeignKey("teams.id"), nullable=True, index=True)  # NULL => global chat
     user_id = Column(BigInteger, ForeignKey("users.id"), nullable=False, index=True)
@@ -162,6 +185,33 @@ class ChatMessage(Base):
     deleted = Column(Boolean, default=False)
 
 
+class Conversation(Base):
+    __tablename__ = "conversations"
+    __table_args__ = (
+        Index("ix_conversations_user_last", "user_id", "last_message_at"),
+    )
+
+    user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    partner_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    last_message_id = Column(BigInteger, ForeignKey("chat_messages.id", ondelete="SET NULL"), nullable=True)
+    last_message_at = Column(DateTime(timezone=False), nullable=True)
+    unread_count = Column(Integer, default=0, nullable=False)
+
+
+class WaveScore(Base):
+    __tablename__ = "wave_scores"
+    __table_args__ = (
+        Index("ix_wave_scores_rank", "wave", "entity_type", "points", "solves", "last_solve"),
+    )
+
+    wave = Column(String(100), primary_key=True)
+    entity_type = Column(String(10), primary_key=True)  # "user" or "team"
+    entity_id = Column(BigInteger, primary_key=True)
+    points = Column(Integer, default=0, nullable=False)
+    solves = Column(Integer, default=0, nullable=False)
+    last_solve = Column(DateTime(timezone=False), nullable=True)
+
+
 class AuditLog(Base):
     __tablename__ = "audit_logs"
     id = Column(BigInteger, primary_key=True, autoincrement=True)
@@ -6,7 +6,10 @@ from .user import User
 from .team import Team
 from .challenge import Challenge
 from .submission import Submission
+from .solve import Solve
 from .chat_message import ChatMessage
+from .conversation import Conversation
+from .wave_score import WaveScore
 from .scoreboard import Scoreboard
 from .audit_log import AuditLog
 from .wave import Wave
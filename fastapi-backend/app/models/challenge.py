@@ -1,8 +1,11 @@
 from sqlalchemy import Column, BigInteger, String, Integer, DateTime, Text, Boolean, ForeignKey, Enum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from ..core.config import settings
 from ..core.database import Base
+from typing import Optional
 import enum
+import math
 
 class Difficulty(str, enum.Enum):
     easy = "easy"
@@ -29,7 +32,18 @@ class Challenge(Base):
     hint_requests = relationship("HintRequest", back_populates="challenge")
     wave = relationship("Wave", back_populates="challenges")
 
-    def calculate_dynamic_points(self):
-        # Simple dynamic scoring based on solves
-        # This would need to be enhanced with actual solve tracking
-        return self.base_points
+    def calculate_dynamic_points(self, solves: Optional[int] = None) -> int:
+        """Value of each solve once the challenge has `solves` solves.
+
+        `points` is what every solve is currently worth, and what submissions
+        award and reprice against. A dynamic challenge derives it from
+        max_points alone, the first solve's value, decaying quadratically to
+        min_points after DYNAMIC_POINTS_DECAY solves. Static challenges keep
+        `points`.
+        """
+        if not self.dynamic_points:
+            return self.points
+        minimum = min(self.min_points or 0, self.max_points)
+        solves = self.solves if solves is None else solves
+        decayed = max((solves or 0) - 1, 0) ** 2 / settings.DYNAMIC_POINTS_DECAY ** 2
+        return max(math.ceil(self.max_points - (self.max_points - minimum) * decayed), minimum)
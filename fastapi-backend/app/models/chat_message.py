@@ -1,4 +1,4 @@
-from sqlalchemy import Column, BigInteger, String, Boolean, DateTime, Text, ForeignKey, Enum
+from sqlalchemy import Column, BigInteger, String, Boolean, DateTime, Text, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
@@ -12,6 +12,10 @@ class MessageType(str, enum.Enum):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # Keyset pagination walks (created_at, id) from either end
+        Index("ix_chat_created_id", "created_at", "id"),
+    )
 
     id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
     team_id = Column(BigInteger, ForeignKey("teams.id"), nullable=True)  # NULL => global chat
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, BigInteger, Integer, DateTime, ForeignKey, Index
+from ..core.database import Base
+
+class Conversation(Base):
+    """One row per participant of a private conversation, maintained on send"""
+    __tablename__ = "conversations"
+    __table_args__ = (
+        Index("ix_conversations_user_last", "user_id", "last_message_at"),
+    )
+
+    user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    partner_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    last_message_id = Column(BigInteger, ForeignKey("chat_messages.id", ondelete="SET NULL"), nullable=True)
+    last_message_at = Column(DateTime, nullable=True)
+    unread_count = Column(Integer, default=0, nullable=False)
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, BigInteger, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
 
 class ScoreHistory(Base):
     __tablename__ = "score_history"
+    __table_args__ = (
+        # Covers the timeline query: per-team range scan without touching rows
+        Index("ix_score_history_team_time", "team_id", "created_at", "delta"),
+    )
 
     id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
     team_id = Column(BigInteger, ForeignKey("teams.id"), nullable=True)
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, BigInteger, DateTime, ForeignKey, UniqueConstraint, Index
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from ..core.database import Base
+
+class Solve(Base):
+    __tablename__ = "solves"
+    __table_args__ = (
+        UniqueConstraint("user_id", "challenge_id", name="uq_solves_user_challenge"),
+        Index("ix_solves_challenge", "challenge_id"),
+        Index("ix_solves_team", "team_id"),
+    )
+
+    id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
+    user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    team_id = Column(BigInteger, ForeignKey("teams.id", ondelete="SET NULL"), nullable=True)
+    challenge_id = Column(BigInteger, ForeignKey("challenges.id", ondelete="CASCADE"), nullable=False)
+    solved_at = Column(DateTime, server_default=func.now())
+
+    # Relationships
+    user = relationship("User")
+    challenge = relationship("Challenge")
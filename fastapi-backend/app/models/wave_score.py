@@ -0,0 +1,16 @@
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, Index
+from ..core.database import Base
+
+class WaveScore(Base):
+    """Per-wave points of one user or team, maintained on solve"""
+    __tablename__ = "wave_scores"
+    __table_args__ = (
+        Index("ix_wave_scores_rank", "wave", "entity_type", "points", "solves", "last_solve"),
+    )
+
+    wave = Column(String(100), primary_key=True)
+    entity_type = Column(String(10), primary_key=True)  # "user" or "team"
+    entity_id = Column(BigInteger, primary_key=True)
+    points = Column(Integer, default=0, nullable=False)
+    solves = Column(Integer, default=0, nullable=False)
+    last_solve = Column(DateTime, nullable=True)
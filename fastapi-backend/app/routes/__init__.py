@@ -5,6 +5,7 @@ from .teams import router as teams_router
 from .scoreboard import router as scoreboard_router
 from .messages import router as messages_router
 from .gamification import router as gamification_router
+from .metrics import router as metrics_router
 
 auth = auth_router
 users = users_router
@@ -13,3 +14,4 @@ teams = teams_router
 scoreboard = scoreboard_router
 messages = messages_router
 gamification = gamification_router
+metrics = metrics_router
@@ -1,12 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from ..core.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.database import get_async_db
 from ..models import User
-from ..utils.auth import verify_password, get_password_hash, create_access_token, get_current_user
+from ..utils.auth import (
+    verify_password_async, get_password_hash_async, create_access_token, get_current_user_async,
+    oauth2_scheme, revoke_token
+)
+from ..utils.platform_stats import platform_stats
 from pydantic import BaseModel
+from redis import RedisError
+import logging
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 class UserCreate(BaseModel):
     username: str
@@ -26,32 +34,51 @@ class Token(BaseModel):
     token_type: str
 
 @router.post("/register", response_model=UserResponse)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if user exists
-    if db.query(User).filter((User.username == user_data.username) | (User.email == user_data.email)).first():
+    existing = await db.execute(
+        select(User.id).filter((User.username == user_data.username) | (User.email == user_data.email))
+    )
+    if existing.first():
         raise HTTPException(status_code=400, detail="Username or email already registered")
     
     # Create user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     db_user = User(
         username=user_data.username,
         email=user_data.email,
         password_hash=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    platform_stats.incr("total_users")
+    await db.refresh(db_user)
     return db_user
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password_hash):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(User).filter(User.username == form_data.username))
+    user = result.scalars().first()
+    if not user or not await verify_password_async(form_data.password, user.password_hash):
         raise HTTPException(status_code=400, detail="Incorrect username or password")
+    if user.is_blocked:
+        raise HTTPException(status_code=403, detail="Account is blocked")
     
-    access_token = create_access_token(data={"sub": user.username})
+    access_token = create_access_token(data={"sub": user.username, "uid": user.id})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserResponse)
-async def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: User = Depends(get_current_user_async)):
     return current_user
+
+@router.post("/logout")
+async def logout(token: str = Depends(oauth2_scheme)):
+    try:
+        revoke_token(token)
+    except RedisError:
+        logger.exception("Failed to record token revocation")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Logout could not be recorded, please try again"
+        )
+    return {"message": "Logged out"}
@@ -1,11 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from ..core.database import get_db
-from ..models import Challenge, Submission, User
-from ..utils.auth import get_current_user
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, update, insert, func, literal
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings
+from ..core.database import get_async_db
+from ..models import Challenge, Submission, Solve, Team, User, WaveScore, ScoreHistory
+from ..utils.auth import get_current_user_async
+from ..utils.user_cache import user_cache
+from ..utils.rate_limit import limit_flag_submissions, attempt_counter
+from ..utils.flags import FLAG_FORMATS, FlagVerifier, hash_flag, flag_verifiers
+from ..utils.platform_stats import platform_stats
+from ..utils.response_cache import scoreboard_responses
+from ..utils.scoreboard import scoreboard_cache
+from ..utils.scoreboard_push import scoreboard_pusher
 from pydantic import BaseModel
 from typing import List, Optional
+from redis import RedisError
+from datetime import datetime
 import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+MYSQL_DEADLOCK = 1213  # ER_LOCK_DEADLOCK
 
 router = APIRouter()
 
@@ -19,6 +39,7 @@ class ChallengeCreate(BaseModel):
     min_points: Optional[int] = 0
     max_points: Optional[int] = 0
     flag: str
+    flag_format: Optional[str] = "exact"  # exact, case_insensitive, regex
     hints: Optional[List[str]] = []
     wave: str
     dependencies: Optional[List[int]] = []
@@ -37,6 +58,7 @@ class ChallengeUpdate(BaseModel):
     min_points: Optional[int] = None
     max_points: Optional[int] = None
     flag: Optional[str] = None
+    flag_format: Optional[str] = None
     hints: Optional[List[str]] = None
     wave: Optional[str] = None
     dependencies: Optional[List[int]] = None
@@ -56,7 +78,7 @@ class ChallengeResponse(BaseModel):
     dynamic_points: bool
     min_points: int
     max_points: int
-    solved_by: List[int]
+    solved: bool
     attempts: int
     solves: int
     is_active: bool
@@ -67,15 +89,113 @@ class ChallengeResponse(BaseModel):
 class SubmissionCreate(BaseModel):
     flag: str
 
+def _encode_flag(flag: str, flag_format: Optional[str]) -> str:
+    flag_format = flag_format or "exact"
+    if flag_format not in FLAG_FORMATS:
+        raise HTTPException(status_code=400, detail=f"flag_format must be one of {', '.join(FLAG_FORMATS)}")
+    try:
+        return hash_flag(flag, flag_format)
+    except re.error:
+        raise HTTPException(status_code=400, detail="Invalid flag regex")
+
+def _normalize_dynamic(challenge: Challenge):
+    # Dynamic challenges decay from max_points; without one they start at `points`
+    if challenge.dynamic_points and not challenge.max_points:
+        challenge.max_points = challenge.points
+
+async def _has_solved(db: AsyncSession, user_id: int, challenge_id: int) -> bool:
+    # Point lookup on the (user_id, challenge_id) unique index
+    solve_id = await db.scalar(
+        select(Solve.id).filter(Solve.user_id == user_id, Solve.challenge_id == challenge_id)
+    )
+    return solve_id is not None
+
+async def _reprice_solves(db: AsyncSession, challenge_id: int, wave: Optional[str], solver_id: int,
+                          value: int, delta: int):
+    """Move every earlier solve of a challenge to its new `value`.
+
+    Each table is rewritten by one UPDATE over the challenge's solves, with
+    team totals shifted by `delta` times that team's solve count. Returns the
+    (user_id, team_id) of the unblocked earlier solvers for the Redis boards.
+    """
+    earlier = (Solve.challenge_id == challenge_id, Solve.user_id != solver_id)
+    
+    def team_solves(team_id):
+        return select(func.count(Solve.id)).filter(*earlier, Solve.team_id == team_id).scalar_subquery()
+    
+    await db.execute(
+        update(Challenge).where(Challenge.id == challenge_id).values(points=value)
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        update(Submission).where(Submission.challenge_id == challenge_id, Submission.is_correct == True)
+        .values(points_awarded=value)
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        update(User).where(User.id.in_(select(Solve.user_id).filter(*earlier)))
+        .values(points=User.points + delta)
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        update(Team).where(Team.id.in_(select(Solve.team_id).filter(*earlier)))
+        .values(total_points=Team.total_points + delta * team_solves(Team.id))
+        .execution_options(synchronize_session=False)
+    )
+    if wave:
+        await db.execute(
+            update(WaveScore).where(
+                WaveScore.wave == wave, WaveScore.entity_type == "user",
+                WaveScore.entity_id.in_(select(Solve.user_id).filter(*earlier))
+            ).values(points=WaveScore.points + delta)
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            update(WaveScore).where(
+                WaveScore.wave == wave, WaveScore.entity_type == "team",
+                WaveScore.entity_id.in_(select(Solve.team_id).filter(*earlier))
+            ).values(points=WaveScore.points + delta * team_solves(WaveScore.entity_id))
+            .execution_options(synchronize_session=False)
+        )
+    await db.execute(
+        insert(ScoreHistory).from_select(
+            ["team_id", "delta", "reason", "created_at"],
+            select(Solve.team_id, func.count(Solve.id) * delta, literal(f"decay:{challenge_id}"), func.utc_timestamp())
+            .filter(*earlier, Solve.team_id != None)
+            .group_by(Solve.team_id)
+        )
+    )
+    
+    return (await db.execute(
+        select(Solve.user_id, Solve.team_id)
+        .join(User, Solve.user_id == User.id)
+        .filter(*earlier, User.is_blocked == False)
+    )).all()
+
+async def _record_wave_score(db: AsyncSession, wave: str, user_id: int, team_id: Optional[int],
+                             points: int, solved_at: datetime):
+    """Add a solve to the wave_scores rows of the solver and their team"""
+    rows = [{"wave": wave, "entity_type": "user", "entity_id": user_id,
+             "points": points, "solves": 1, "last_solve": solved_at}]
+    if team_id:
+        rows.append({"wave": wave, "entity_type": "team", "entity_id": team_id,
+                     "points": points, "solves": 1, "last_solve": solved_at})
+    stmt = mysql_insert(WaveScore).values(rows)
+    await db.execute(stmt.on_duplicate_key_update(
+        points=WaveScore.points + stmt.inserted.points,
+        solves=WaveScore.solves + 1,
+        last_solve=stmt.inserted.last_solve
+    ))
+
 @router.get("/", response_model=List[ChallengeResponse])
 async def get_challenges(
     wave: Optional[str] = None,
     category: Optional[str] = None,
     difficulty: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Challenge).filter(Challenge.is_active == True)
+    query = select(Challenge).filter(Challenge.is_active == True)
     
     if wave:
         query = query.filter(Challenge.wave == wave)
@@ -84,103 +204,226 @@ async def get_challenges(
     if difficulty:
         query = query.filter(Challenge.difficulty == difficulty)
     
-    challenges = query.all()
+    challenges = (await db.execute(query)).scalars().all()
     
-    # Convert solved_by from JSON string to list
+    # Mark the ones the current user has solved with a single indexed lookup
+    solved_ids = set((await db.execute(
+        select(Solve.challenge_id).filter(Solve.user_id == current_user.id)
+    )).scalars().all())
     for challenge in challenges:
-        challenge.solved_by = json.loads(challenge.solved_by) if challenge.solved_by else []
+        challenge.solved = challenge.id in solved_ids
     
     return challenges
 
 @router.get("/{challenge_id}", response_model=ChallengeResponse)
 async def get_challenge(
     challenge_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    challenge = db.query(Challenge).filter(Challenge.id == challenge_id).first()
+    challenge = await db.get(Challenge, challenge_id)
     if not challenge:
         raise HTTPException(status_code=404, detail="Challenge not found")
     
-    challenge.solved_by = json.loads(challenge.solved_by) if challenge.solved_by else []
+    challenge.solved = await _has_solved(db, current_user.id, challenge_id)
     return challenge
 
 @router.post("/", response_model=ChallengeResponse)
 async def create_challenge(
     challenge_data: ChallengeCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.role not in ["admin", "moderator"]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
     db_challenge = Challenge(
-        **challenge_data.dict(),
+        **challenge_data.dict(exclude={"flag", "flag_format"}),
+        flag_hash=_encode_flag(challenge_data.flag, challenge_data.flag_format),
         hints=json.dumps(challenge_data.hints),
         dependencies=json.dumps(challenge_data.dependencies),
         tags=json.dumps(challenge_data.tags),
         files=json.dumps(challenge_data.files),
-        solved_by=json.dumps([]),
         created_by=current_user.id
     )
+    _normalize_dynamic(db_challenge)
+    if db_challenge.dynamic_points:
+        db_challenge.points = db_challenge.calculate_dynamic_points(0)
     db.add(db_challenge)
-    db.commit()
-    db.refresh(db_challenge)
-    db_challenge.solved_by = []
+    await db.commit()
+    if db_challenge.is_active:
+        platform_stats.incr("total_challenges")
+    await db.refresh(db_challenge)
+    db_challenge.solved = False
     return db_challenge
 
 @router.put("/{challenge_id}", response_model=ChallengeResponse)
 async def update_challenge(
     challenge_id: int,
     challenge_update: ChallengeUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.role not in ["admin", "moderator"]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    challenge = db.query(Challenge).filter(Challenge.id == challenge_id).first()
+    challenge = await db.get(Challenge, challenge_id)
     if not challenge:
         raise HTTPException(status_code=404, detail="Challenge not found")
     
     update_data = challenge_update.dict(exclude_unset=True)
+    flag_format = update_data.pop("flag_format", None)
+    if "flag" in update_data:
+        update_data["flag_hash"] = _encode_flag(update_data.pop("flag"), flag_format)
+    elif flag_format is not None:
+        raise HTTPException(status_code=400, detail="flag is required when changing flag_format")
     for field in ['hints', 'dependencies', 'tags', 'files']:
         if field in update_data:
             update_data[field] = json.dumps(update_data[field])
     
+    was_active = challenge.is_active
     for field, value in update_data.items():
         setattr(challenge, field, value)
+    _normalize_dynamic(challenge)
     
-    db.commit()
-    db.refresh(challenge)
-    challenge.solved_by = json.loads(challenge.solved_by) if challenge.solved_by else []
+    await db.commit()
+    flag_verifiers.invalidate(challenge_id)
+    if bool(challenge.is_active) != bool(was_active):
+        platform_stats.incr("total_challenges", 1 if challenge.is_active else -1)
+    await db.refresh(challenge)
+    challenge.solved = await _has_solved(db, current_user.id, challenge_id)
     return challenge
 
 @router.delete("/{challenge_id}")
 async def delete_challenge(
     challenge_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    challenge = db.query(Challenge).filter(Challenge.id == challenge_id).first()
+    challenge = await db.get(Challenge, challenge_id)
     if not challenge:
         raise HTTPException(status_code=404, detail="Challenge not found")
     
-    db.delete(challenge)
-    db.commit()
+    was_active = challenge.is_active
+    await db.delete(challenge)
+    await db.commit()
+    flag_verifiers.invalidate(challenge_id)
+    if was_active:
+        platform_stats.incr("total_challenges", -1)
     return {"message": "Challenge deleted successfully"}
 
-@router.post("/{challenge_id}/submit", response_model=dict)
+def _is_deadlock(exc: OperationalError) -> bool:
+    return bool(getattr(exc.orig, "args", None)) and exc.orig.args[0] == MYSQL_DEADLOCK
+
+async def _record_submission(db: AsyncSession, challenge: FlagVerifier, user_id: int, team_id: Optional[int],
+                             flag: str, is_correct: bool):
+    """Write one submission and, if correct, the solve and every score it moves, then commit.
+
+    Safe to call again after a rollback. Returns (points_awarded, solved_at,
+    repriced, delta) for the post-commit Redis updates.
+    """
+    challenge_id = challenge.challenge_id
+    points_awarded, solved_at = 0, None
+    
+    # Counters are bumped with UPDATE ... SET x = x + n so concurrent
+    # submissions cannot overwrite each other's increments
+    await db.execute(
+        update(Challenge).where(Challenge.id == challenge_id)
+        .values(attempts=Challenge.attempts + 1)
+        .execution_options(synchronize_session=False)
+    )
+    
+    repriced, delta = [], 0
+    if is_correct:
+        points_awarded = challenge.points
+        solved_at = datetime.utcnow()
+        db.add(Solve(user_id=user_id, team_id=team_id, challenge_id=challenge_id))
+        await db.execute(
+            update(Challenge).where(Challenge.id == challenge_id)
+            .values(solves=Challenge.solves + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if challenge.dynamic:
+            # The UPDATE above holds the row lock until commit, so solves of one
+            # challenge reprice one at a time against the current solve count
+            current = await db.get(Challenge, challenge_id, with_for_update=True, populate_existing=True)
+            points_awarded = current.calculate_dynamic_points()
+            delta = points_awarded - current.points
+            if delta:
+                repriced = await _reprice_solves(db, challenge_id, challenge.wave, user_id,
+                                                 points_awarded, delta)
+        await db.execute(
+            update(User).where(User.id == user_id)
+            .values(
+                points=User.points + points_awarded,
+                xp=User.xp + points_awarded,
+                level=func.floor((User.xp + points_awarded) / 100) + 1,  # Simple leveling
+                solves=User.solves + 1,
+                last_solve=solved_at
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if team_id:
+            await db.execute(
+                update(Team).where(Team.id == team_id)
+                .values(
+                    total_points=Team.total_points + points_awarded,
+                    solves=Team.solves + 1,
+                    last_solve=solved_at
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.add(ScoreHistory(team_id=team_id, delta=points_awarded,
+                                reason=f"solve:{challenge_id}", created_at=solved_at))
+        if challenge.wave:
+            await _record_wave_score(db, challenge.wave, user_id, team_id, points_awarded, solved_at)
+    
+    db.add(Submission(
+        user_id=user_id,
+        team_id=team_id,
+        challenge_id=challenge_id,
+        flag=flag,
+        is_correct=is_correct,
+        points_awarded=points_awarded
+    ))
+    await db.commit()
+    return points_awarded, solved_at, repriced, delta
+
+async def _release_attempt(user_id: int, challenge_id: int):
+    try:
+        await run_in_threadpool(attempt_counter.release, user_id, challenge_id)
+    except RedisError:
+        # The counter is reseeded from the submissions table once it expires,
+        # so a missed release only costs the user an attempt until then
+        logger.exception("Failed to release attempt of user %s on challenge %s", user_id, challenge_id)
+
+def _publish_solve(challenge_id: int, challenge: FlagVerifier, user_id: int, team_id: Optional[int],
+                   username: str, points_awarded: int, solved_at: datetime, repriced: list, delta: int):
+    """Push a committed solve to the Redis caches; blocking, so run in the threadpool"""
+    # Points changed outside the unit of work, so evict the cached users explicitly
+    user_cache.invalidate_many([user_id] + [solver_id for solver_id, _ in repriced])
+    try:
+        scoreboard_cache.record_solve(user_id, team_id, challenge.wave, points_awarded,
+                                      solved_at, repriced=repriced, delta=delta)
+        scoreboard_pusher.mark_dirty()
+        platform_stats.record_solve(username, challenge.title, points_awarded, solved_at)
+        scoreboard_responses.invalidate()
+    except RedisError:
+        # The board can be regenerated with `python -m app.utils.scoreboard rebuild`
+        logger.exception("Failed to update scoreboard for challenge %s", challenge_id)
+
+@router.post("/{challenge_id}/submit", response_model=dict, dependencies=[Depends(limit_flag_submissions)])
 async def submit_flag(
     challenge_id: int,
     submission_data: SubmissionCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    challenge = db.query(Challenge).filter(Challenge.id == challenge_id).first()
+    # Everything submit needs comes from the cached verifier, not the challenge row
+    challenge = await flag_verifiers.get(db, challenge_id)
     if not challenge:
         raise HTTPException(status_code=404, detail="Challenge not found")
     
@@ -188,44 +431,60 @@ async def submit_flag(
         raise HTTPException(status_code=400, detail="Challenge is not active")
     
     # Check if user already solved this challenge
-    solved_by = json.loads(challenge.solved_by) if challenge.solved_by else []
-    if current_user.id in solved_by:
+    if await _has_solved(db, current_user.id, challenge_id):
         return {"correct": False, "message": "Already solved"}
     
-    # Check max attempts
-    user_submissions = db.query(Submission).filter(
-        Submission.user_id == current_user.id,
-        Submission.challenge_id == challenge_id
-    ).count()
-    
-    if challenge.max_attempts > 0 and user_submissions >= challenge.max_attempts:
-        return {"correct": False, "message": "Max attempts reached"}
+    # Check max attempts against the Redis counter, falling back to COUNT(*)
+    attempt_reserved = False
+    if challenge.max_attempts > 0:
+        try:
+            if not await attempt_counter.reserve(db, current_user.id, challenge_id, challenge.max_attempts):
+                return {"correct": False, "message": "Max attempts reached"}
+            attempt_reserved = True
+        except RedisError:
+            user_submissions = await db.scalar(
+                select(func.count(Submission.id)).filter(
+                    Submission.user_id == current_user.id,
+                    Submission.challenge_id == challenge_id
+                )
+            )
+            if user_submissions >= challenge.max_attempts:
+                return {"correct": False, "message": "Max attempts reached"}
     
     # Create submission
-    is_correct = submission_data.flag == challenge.flag
-    points_awarded = 0
+    is_correct = challenge.matches(submission_data.flag)
+    # Read before any rollback, which expires current_user
+    user_id, team_id, username = current_user.id, current_user.team_id, current_user.username
+    try:
+        for attempt in range(settings.SUBMIT_DEADLOCK_RETRIES + 1):
+            try:
+                points_awarded, solved_at, repriced, delta = await _record_submission(
+                    db, challenge, user_id, team_id, submission_data.flag, is_correct
+                )
+                break
+            except IntegrityError:
+                # A concurrent request recorded the same solve first (uq_solves_user_challenge)
+                await db.rollback()
+                if attempt_reserved:
+                    await _release_attempt(user_id, challenge_id)
+                return {"correct": False, "message": "Already solved"}
+            except OperationalError as exc:
+                # Repricing touches every earlier solver's rows, so concurrent solves
+                # can deadlock; InnoDB rolls one of them back and it is replayed here
+                await db.rollback()
+                if not _is_deadlock(exc) or attempt == settings.SUBMIT_DEADLOCK_RETRIES:
+                    raise
+                logger.warning("Deadlock recording a submission to challenge %s, retrying", challenge_id)
+    except BaseException:
+        # Nothing was recorded, including when the client went away mid-request,
+        # so the reserved attempt is given back
+        if attempt_reserved:
+            await _release_attempt(user_id, challenge_id)
+        raise
     
     if is_correct:
-        points_awarded = challenge.points
-        solved_by.append(current_user.id)
-        challenge.solved_by = json.dumps(solved_by)
-        challenge.solves += 1
-        current_user.points += points_awarded
-        current_user.xp += points_awarded
-        current_user.level = current_user.xp // 100 + 1  # Simple leveling
-    
-    challenge.attempts += 1
-    
-    db_submission = Submission(
-        user_id=current_user.id,
-        team_id=current_user.team_id,
-        challenge_id=challenge_id,
-        flag=submission_data.flag,
-        is_correct=is_correct,
-        points_awarded=points_awarded
-    )
-    db.add(db_submission)
-    db.commit()
+        await run_in_threadpool(_publish_solve, challenge_id, challenge, user_id, team_id, username,
+                                points_awarded, solved_at, repriced, delta)
     
     return {
         "correct": is_correct,
@@ -42,7 +42,7 @@ class BadgeInfo(BaseModel):
     earned: bool
 
 @router.get("/stats", response_model=UserStatsResponse)
-async def get_user_stats(
+def get_user_stats(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -50,7 +50,7 @@ async def get_user_stats(
     return gamification_engine.get_user_stats(current_user, db)
 
 @router.get("/leaderboard", response_model=List[LeaderboardEntry])
-async def get_leaderboard(
+def get_leaderboard(
     limit: int = 50,
     db: Session = Depends(get_db)
 ):
@@ -58,7 +58,7 @@ async def get_leaderboard(
     return gamification_engine.get_leaderboard_rankings(db, limit)
 
 @router.get("/badges")
-async def get_available_badges(
+def get_available_badges(
     current_user: User = Depends(get_current_user)
 ):
     """Get all available badges with user's earned status"""
@@ -77,7 +77,7 @@ async def get_available_badges(
     return badges_info
 
 @router.get("/level-progress")
-async def get_level_progress(
+def get_level_progress(
     current_user: User = Depends(get_current_user)
 ):
     """Get detailed level progression information"""
@@ -105,7 +105,7 @@ async def get_level_progress(
     }
 
 @router.get("/streaks")
-async def get_streak_info(
+def get_streak_info(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -133,7 +133,7 @@ async def get_streak_info(
     return streak_stats
 
 @router.get("/achievements")
-async def get_achievements(
+def get_achievements(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -202,7 +202,7 @@ async def get_achievements(
     }
 
 @router.get("/xp-breakdown")
-async def get_xp_breakdown(
+def get_xp_breakdown(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -240,7 +240,7 @@ async def get_xp_breakdown(
     }
 
 @router.get("/rank-comparison")
-async def get_rank_comparison(
+def get_rank_comparison(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
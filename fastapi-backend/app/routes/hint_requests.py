@@ -4,8 +4,15 @@ from sqlalchemy import text
 from ..core.database import get_db
 from ..models import HintRequest, Hint, Challenge, Team, User
 from ..utils.auth import get_current_user
+from ..utils.response_cache import scoreboard_responses
+from ..utils.scoreboard import scoreboard_cache
+from ..utils.scoreboard_push import scoreboard_pusher
 from pydantic import BaseModel
 from typing import List, Optional
+from redis import RedisError
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -28,7 +35,7 @@ class HintRequestResponse(BaseModel):
     note: Optional[str]
 
 @router.post("/", response_model=HintRequestResponse)
-async def create_hint_request(
+def create_hint_request(
     payload: HintRequestCreate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -59,7 +66,7 @@ async def create_hint_request(
     return db_hint_request
 
 @router.post("/{request_id}/approve")
-async def approve_hint_request(
+def approve_hint_request(
     request_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -108,6 +115,22 @@ async def approve_hint_request(
                 {"tid": rq.team_id}
             )
 
+        # Hints priced in points are taken off the team score and logged for the timeline
+        hint = conn.execute(
+            text("SELECT cost_type, cost_amount FROM hints WHERE id = :hid"),
+            {"hid": rq.hint_id}
+        ).first()
+        deduction = hint.cost_amount if hint and hint.cost_type == "points" and hint.cost_amount else 0
+        if deduction:
+            conn.execute(
+                text("UPDATE teams SET total_points = total_points - :cost WHERE id = :tid"),
+                {"cost": deduction, "tid": rq.team_id}
+            )
+            conn.execute(
+                text("INSERT INTO score_history (team_id, delta, reason, created_at) VALUES (:tid, :delta, :reason, UTC_TIMESTAMP())"),
+                {"tid": rq.team_id, "delta": -deduction, "reason": f"hint:{rq.hint_id}"}
+            )
+
         # Mark request approved
         conn.execute(
             text("UPDATE hint_requests SET status='approved', approved_by = :uid, resolved_at = NOW() WHERE id = :id"),
@@ -115,6 +138,13 @@ async def approve_hint_request(
         )
 
         conn.execute(text("COMMIT"))
+        if deduction:
+            try:
+                scoreboard_cache.adjust_team(rq.team_id, -deduction)
+                scoreboard_pusher.mark_dirty()
+                scoreboard_responses.invalidate()
+            except RedisError:
+                logger.exception("Failed to update scoreboard for hint request %s", request_id)
         return {"status": "ok", "message": "Hint approved and revealed."}
 
     except HTTPException:
@@ -129,7 +159,7 @@ async def approve_hint_request(
         db.close()
 
 @router.post("/{request_id}/reject")
-async def reject_hint_request(
+def reject_hint_request(
     request_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -152,7 +182,7 @@ async def reject_hint_request(
     return {"status": "ok", "message": "Hint request rejected."}
 
 @router.get("/", response_model=List[HintRequestResponse])
-async def get_hint_requests(
+def get_hint_requests(
     status_filter: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -169,7 +199,7 @@ async def get_hint_requests(
     return requests
 
 @router.get("/{request_id}", response_model=HintRequestResponse)
-async def get_hint_request(
+def get_hint_request(
     request_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
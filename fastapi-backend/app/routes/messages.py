@@ -1,12 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from ..core.database import get_db
-from ..models import ChatMessage, User
-from ..utils.auth import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, Query, status, WebSocket, WebSocketDisconnect
+from sqlalchemy import select, update, func, desc, asc, and_, or_, case
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.database import AsyncSessionLocal, get_async_db
+from ..models import ChatMessage, Conversation, User
+from ..core.config import settings
+from ..utils.auth import get_current_user_async, authenticate_token_async
+from ..utils.broadcast import manager
+from ..utils.rate_limit import TokenBucket
+from ..utils.scoreboard_push import scoreboard_pusher
+from ..utils.usernames import username_resolver
+from redis import RedisError
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Set
 from datetime import datetime
+import base64
+import binascii
 import json
 
 router = APIRouter()
@@ -16,6 +25,7 @@ class MessageCreate(BaseModel):
     message_type: str = "text"  # text, system, announcement
     is_private: bool = False
     recipient_id: Optional[int] = None
+    team_id: Optional[int] = None  # post to team chat instead of global
 
 class MessageResponse(BaseModel):
     id: int
@@ -25,88 +35,157 @@ class MessageResponse(BaseModel):
     sender_id: int
     recipient_username: Optional[str]
     recipient_id: Optional[int]
+    team_id: Optional[int] = None
     is_private: bool
     created_at: str
     edited_at: Optional[str]
+    cursor: Optional[str] = None
 
-# WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.user_connections: dict[int, WebSocket] = {}
+def _encode_cursor(created_at: datetime, message_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), message_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
-    async def connect(self, websocket: WebSocket, user_id: int):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        self.user_connections[user_id] = websocket
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, message_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(message_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-    def disconnect(self, websocket: WebSocket, user_id: int):
-        self.active_connections.remove(websocket)
-        if user_id in self.user_connections:
-            del self.user_connections[user_id]
+def _between(user_id: int, partner_id: int):
+    return or_(
+        and_(ChatMessage.sender_id == user_id, ChatMessage.recipient_id == partner_id),
+        and_(ChatMessage.sender_id == partner_id, ChatMessage.recipient_id == user_id)
+    )
 
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except:
-                # Remove dead connections
-                if connection in self.active_connections:
-                    self.active_connections.remove(connection)
+async def _index_private_message(db: AsyncSession, message_id: int, sender_id: int, recipient_id: int):
+    """Point both participants' conversation rows at a new private message"""
+    rows = [{"user_id": sender_id, "partner_id": recipient_id, "last_message_id": message_id,
+             "last_message_at": func.now(), "unread_count": 0}]
+    if recipient_id != sender_id:
+        # A note to yourself is one row, and there is nobody for it to be unread by
+        rows.append({"user_id": recipient_id, "partner_id": sender_id, "last_message_id": message_id,
+                     "last_message_at": func.now(), "unread_count": 1})
+    stmt = mysql_insert(Conversation).values(rows)
+    await db.execute(stmt.on_duplicate_key_update(
+        last_message_id=stmt.inserted.last_message_id,
+        last_message_at=stmt.inserted.last_message_at,
+        unread_count=Conversation.unread_count + stmt.inserted.unread_count
+    ))
 
-    async def send_personal_message(self, message: dict, user_id: int):
-        if user_id in self.user_connections:
-            try:
-                await self.user_connections[user_id].send_json(message)
-            except:
-                # Remove dead connection
-                if user_id in self.user_connections:
-                    del self.user_connections[user_id]
+async def _reindex_conversation(db: AsyncSession, deleted: ChatMessage):
+    """Recompute the last message of a conversation after `deleted` was deleted.
 
-manager = ConnectionManager()
+    Unread messages are the newest `unread_count` the recipient was sent, so
+    the deleted one was still unread if fewer live messages from the sender
+    came after it; the recipient's count drops by one in that case.
+    """
+    user_id, partner_id = deleted.sender_id, deleted.recipient_id
+    newer = select(func.count(ChatMessage.id)).filter(
+        ChatMessage.sender_id == user_id,
+        ChatMessage.recipient_id == partner_id,
+        ChatMessage.is_private == True,
+        ChatMessage.is_deleted == False,
+        or_(
+            ChatMessage.created_at > deleted.created_at,
+            and_(ChatMessage.created_at == deleted.created_at, ChatMessage.id > deleted.id)
+        )
+    ).scalar_subquery()
+    last = (await db.execute(
+        select(ChatMessage.id, ChatMessage.created_at)
+        .filter(_between(user_id, partner_id), ChatMessage.is_private == True, ChatMessage.is_deleted == False)
+        .order_by(desc(ChatMessage.created_at), desc(ChatMessage.id))
+        .limit(1)
+    )).first()
+    await db.execute(
+        update(Conversation)
+        .where(or_(
+            and_(Conversation.user_id == user_id, Conversation.partner_id == partner_id),
+            and_(Conversation.user_id == partner_id, Conversation.partner_id == user_id)
+        ))
+        .values(
+            last_message_id=last.id if last else None,
+            last_message_at=last.created_at if last else None,
+            unread_count=case(
+                (and_(Conversation.user_id == partner_id, Conversation.unread_count > newer),
+                 Conversation.unread_count - 1),
+                else_=Conversation.unread_count
+            )
+        )
+    )
 
 @router.get("/", response_model=List[MessageResponse])
 async def get_messages(
-    skip: int = 0,
-    limit: int = 50,
+    limit: int = Query(50, ge=1, le=100),
+    before: Optional[str] = None,
+    since: Optional[str] = None,
     message_type: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(ChatMessage).filter(ChatMessage.is_deleted == False)
+    """Page through chat history by (created_at, id) cursor.
+
+    Without a cursor the newest messages are returned, newest first. Pass the
+    `cursor` of the last message as `before` to scroll back, or the `cursor`
+    of the newest message seen as `since` to poll for newer messages, which
+    are returned oldest first.
+    """
+    if before and since:
+        raise HTTPException(status_code=400, detail="Use either before or since, not both")
+    
+    query = select(ChatMessage).filter(ChatMessage.is_deleted == False)
     
     # Filter by message type
     if message_type:
         query = query.filter(ChatMessage.message_type == message_type)
     
-    # Show only public messages and private messages involving current user
+    # Show only global and own-team messages and private messages involving current user
     query = query.filter(
-        (ChatMessage.is_private == False) |
+        ((ChatMessage.is_private == False) &
+         ((ChatMessage.team_id == None) | (ChatMessage.team_id == current_user.team_id))) |
         (ChatMessage.sender_id == current_user.id) |
         (ChatMessage.recipient_id == current_user.id)
     )
     
-    messages = query.order_by(desc(ChatMessage.created_at)).offset(skip).limit(limit).all()
+    # Seek past the cursor instead of OFFSET, so every page costs the same
+    if since:
+        created_at, message_id = _decode_cursor(since)
+        query = query.filter(or_(
+            ChatMessage.created_at > created_at,
+            and_(ChatMessage.created_at == created_at, ChatMessage.id > message_id)
+        )).order_by(asc(ChatMessage.created_at), asc(ChatMessage.id))
+    else:
+        if before:
+            created_at, message_id = _decode_cursor(before)
+            query = query.filter(or_(
+                ChatMessage.created_at < created_at,
+                and_(ChatMessage.created_at == created_at, ChatMessage.id < message_id)
+            ))
+        query = query.order_by(desc(ChatMessage.created_at), desc(ChatMessage.id))
+    
+    messages = (await db.execute(query.limit(limit))).scalars().all()
+    
+    # Resolve every sender and recipient name in one batched lookup
+    usernames = await username_resolver.resolve_async(
+        db, [msg.sender_id for msg in messages] + [msg.recipient_id for msg in messages]
+    )
     
-    # Get sender and recipient usernames
     result = []
     for msg in messages:
-        sender = db.query(User).filter(User.id == msg.sender_id).first()
-        recipient = None
-        if msg.recipient_id:
-            recipient = db.query(User).filter(User.id == msg.recipient_id).first()
-        
         result.append(MessageResponse(
             id=msg.id,
             content=msg.content,
             message_type=msg.message_type,
-            sender_username=sender.username if sender else "Unknown",
+            sender_username=usernames.get(msg.sender_id, "Unknown"),
             sender_id=msg.sender_id,
-            recipient_username=recipient.username if recipient else None,
+            recipient_username=usernames.get(msg.recipient_id) if msg.recipient_id else None,
             recipient_id=msg.recipient_id,
+            team_id=msg.team_id,
             is_private=msg.is_private,
             created_at=msg.created_at.isoformat(),
-            edited_at=msg.edited_at.isoformat() if msg.edited_at else None
+            edited_at=msg.edited_at.isoformat() if msg.edited_at else None,
+            cursor=_encode_cursor(msg.created_at, msg.id)
         ))
     
     return result
@@ -114,30 +193,37 @@ async def get_messages(
 @router.post("/", response_model=MessageResponse)
 async def create_message(
     message_data: MessageCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Validate recipient for private messages
     if message_data.is_private and not message_data.recipient_id:
         raise HTTPException(status_code=400, detail="Recipient is required for private messages")
     
     if message_data.recipient_id:
-        recipient = db.query(User).filter(User.id == message_data.recipient_id).first()
+        recipient = await db.get(User, message_data.recipient_id)
         if not recipient:
             raise HTTPException(status_code=404, detail="Recipient not found")
     
+    if message_data.team_id is not None and message_data.team_id != current_user.team_id:
+        raise HTTPException(status_code=403, detail="You can only post to your own team chat")
+    
     # Create message
     message = ChatMessage(
         content=message_data.content,
         message_type=message_data.message_type,
         sender_id=current_user.id,
         recipient_id=message_data.recipient_id,
+        team_id=None if message_data.is_private else message_data.team_id,
         is_private=message_data.is_private
     )
     
     db.add(message)
-    db.commit()
-    db.refresh(message)
+    if message.is_private and message.recipient_id:
+        await db.flush()
+        await _index_private_message(db, message.id, current_user.id, message.recipient_id)
+    await db.commit()
+    await db.refresh(message)
     
     # Broadcast message via WebSocket
     message_dict = {
@@ -148,15 +234,19 @@ async def create_message(
         "sender_id": current_user.id,
         "recipient_username": recipient.username if message_data.recipient_id and recipient else None,
         "recipient_id": message.recipient_id,
+        "team_id": message.team_id,
         "is_private": message.is_private,
         "created_at": message.created_at.isoformat(),
-        "edited_at": None
+        "edited_at": None,
+        "cursor": _encode_cursor(message.created_at, message.id)
     }
     
     if message.is_private and message.recipient_id:
         # Send to both sender and recipient
         await manager.send_personal_message(message_dict, current_user.id)
         await manager.send_personal_message(message_dict, message.recipient_id)
+    elif message.team_id is not None:
+        await manager.send_to_team(message_dict, message.team_id)
     else:
         # Broadcast to all
         await manager.broadcast(message_dict)
@@ -167,10 +257,10 @@ async def create_message(
 async def update_message(
     message_id: int,
     message_data: MessageCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    message = db.query(ChatMessage).filter(ChatMessage.id == message_id).first()
+    message = await db.get(ChatMessage, message_id)
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
     
@@ -182,32 +272,33 @@ async def update_message(
     message.content = message_data.content
     message.edited_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(message)
+    await db.commit()
+    await db.refresh(message)
     
     # Get usernames
-    sender = db.query(User).filter(User.id == message.sender_id).first()
-    recipient = None
-    if message.recipient_id:
-        recipient = db.query(User).filter(User.id == message.recipient_id).first()
+    usernames = await username_resolver.resolve_async(db, [message.sender_id, message.recipient_id])
     
     message_dict = {
         "id": message.id,
         "content": message.content,
         "message_type": message.message_type,
-        "sender_username": sender.username if sender else "Unknown",
+        "sender_username": usernames.get(message.sender_id, "Unknown"),
         "sender_id": message.sender_id,
-        "recipient_username": recipient.username if recipient else None,
+        "recipient_username": usernames.get(message.recipient_id) if message.recipient_id else None,
         "recipient_id": message.recipient_id,
+        "team_id": message.team_id,
         "is_private": message.is_private,
         "created_at": message.created_at.isoformat(),
-        "edited_at": message.edited_at.isoformat()
+        "edited_at": message.edited_at.isoformat(),
+        "cursor": _encode_cursor(message.created_at, message.id)
     }
     
     # Broadcast update
     if message.is_private and message.recipient_id:
         await manager.send_personal_message(message_dict, current_user.id)
         await manager.send_personal_message(message_dict, message.recipient_id)
+    elif message.team_id is not None:
+        await manager.send_to_team(message_dict, message.team_id)
     else:
         await manager.broadcast(message_dict)
     
@@ -216,10 +307,10 @@ async def update_message(
 @router.delete("/{message_id}")
 async def delete_message(
     message_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    message = db.query(ChatMessage).filter(ChatMessage.id == message_id).first()
+    message = await db.get(ChatMessage, message_id)
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
     
@@ -229,7 +320,10 @@ async def delete_message(
     
     # Soft delete
     message.is_deleted = True
-    db.commit()
+    if message.is_private and message.recipient_id:
+        await db.flush()
+        await _reindex_conversation(db, message)
+    await db.commit()
     
     # Broadcast deletion
     delete_dict = {
@@ -241,62 +335,166 @@ async def delete_message(
     if message.is_private and message.recipient_id:
         await manager.send_personal_message(delete_dict, current_user.id)
         await manager.send_personal_message(delete_dict, message.recipient_id)
+    elif message.team_id is not None:
+        await manager.send_to_team(delete_dict, message.team_id)
     else:
         await manager.broadcast(delete_dict)
     
     return {"message": "Message deleted successfully"}
 
+async def _may_signal(user: User, recipient_id: int) -> bool:
+    """Whether `recipient_id` is a conversation partner or teammate of `user`"""
+    async with AsyncSessionLocal() as db:
+        partner = await db.scalar(
+            select(Conversation.partner_id)
+            .filter(Conversation.user_id == user.id, Conversation.partner_id == recipient_id)
+        )
+        if partner is not None:
+            return True
+        if user.team_id is None:
+            return False
+        teammate = await db.scalar(
+            select(User.id).filter(User.id == recipient_id, User.team_id == user.team_id)
+        )
+        return teammate is not None
+
+async def _handle_frame(websocket: WebSocket, user: User, data: str, partners: Set[int]):
+    try:
+        frame = json.loads(data)
+        frame_type = frame.get("type")
+    except (ValueError, AttributeError):
+        manager.reply(websocket, {"type": "error", "detail": "Invalid frame"})
+        return
+    
+    if frame_type == "ping":
+        manager.reply(websocket, {"type": "pong", "ts": frame.get("ts")})
+    elif frame_type in ("subscribe", "unsubscribe"):
+        channel = frame.get("channel")
+        if frame_type == "subscribe":
+            ok = manager.subscribe(websocket, channel)
+        else:
+            ok = manager.unsubscribe(websocket, channel)
+        if ok:
+            manager.reply(websocket, {"type": f"{frame_type}d", "channel": channel})
+            if frame_type == "subscribe" and channel == "scoreboard":
+                try:
+                    manager.reply(websocket, await scoreboard_pusher.snapshot())
+                except RedisError:
+                    manager.reply(websocket, {"type": "error", "detail": "Scoreboard is temporarily unavailable"})
+        else:
+            manager.reply(websocket, {"type": "error", "detail": f"Unknown channel: {channel}"})
+    elif frame_type == "typing":
+        event = {"type": "typing", "user_id": user.id, "username": user.username}
+        recipient_id = frame.get("recipient_id")
+        if isinstance(recipient_id, int):
+            # Only people the user already talks to; `partners` caches the
+            # recipients this connection has been allowed to signal
+            if recipient_id not in partners:
+                if not await _may_signal(user, recipient_id):
+                    manager.reply(websocket, {"type": "error", "detail": "Unknown recipient"})
+                    return
+                partners.add(recipient_id)
+            event["recipient_id"] = recipient_id
+            await manager.send_personal_message(event, recipient_id)
+        elif user.team_id is not None:
+            event["team_id"] = user.team_id
+            await manager.send_to_team(event, user.team_id)
+    else:
+        manager.reply(websocket, {"type": "error", "detail": f"Unknown frame type: {frame_type}"})
+
+@router.websocket("/ws")
 @router.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: int):
-    await manager.connect(websocket, user_id)
+async def websocket_endpoint(websocket: WebSocket, user_id: Optional[int] = None, token: Optional[str] = None):
+    """Chat socket, authenticated with the access token.
+
+    Browsers can't set headers on the handshake, so the token may be passed
+    as ?token=. Inbound frames are JSON objects with a "type" of ping,
+    subscribe/unsubscribe (with "channel": global, team or scoreboard) or typing (with an optional
+    "recipient_id", a conversation partner or teammate, otherwise sent to the team).
+    """
+    if token is None:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        token = credentials if scheme.lower() == "bearer" else None
+    user = await authenticate_token_async(token) if token else None
+    # The path id is only kept for old clients; it must match the token
+    if user is None or (user_id is not None and user_id != user.id):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await manager.connect(websocket, user.id, user.team_id)
+    limiter = TokenBucket(settings.WS_FRAME_RATE, settings.WS_FRAME_BURST)
+    partners: Set[int] = set()
     try:
         while True:
             data = await websocket.receive_text()
-            # Handle incoming messages if needed
-            pass
+            if len(data) > settings.WS_MAX_FRAME_BYTES:
+                await websocket.close(code=status.WS_1009_MESSAGE_TOO_BIG)
+                break
+            if not limiter.consume():
+                manager.reply(websocket, {"type": "error", "detail": "Rate limit exceeded"})
+                continue
+            await _handle_frame(websocket, user, data, partners)
     except WebSocketDisconnect:
-        manager.disconnect(websocket, user_id)
+        pass
+    finally:
+        manager.disconnect(websocket)
+
+@router.get("/online")
+async def get_online_users(current_user: User = Depends(get_current_user_async)):
+    """Users with at least one live chat connection on any worker"""
+    try:
+        user_ids = manager.online_users()
+    except RedisError:
+        raise HTTPException(status_code=503, detail="Presence is temporarily unavailable")
+    return {"count": len(user_ids), "user_ids": user_ids}
 
 @router.get("/conversations")
 async def get_conversations(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # One range read on ix_conversations_user_last, maintained by create_message
+    rows = (await db.execute(
+        select(
+            Conversation.partner_id,
+            User.username,
+            ChatMessage.content,
+            Conversation.last_message_at,
+            Conversation.unread_count
+        )
+        .join(User, User.id == Conversation.partner_id)
+        .outerjoin(ChatMessage, ChatMessage.id == Conversation.last_message_id)
+        .filter(Conversation.user_id == current_user.id)
+        .order_by(desc(Conversation.last_message_at))
+    )).all()
+    
+    return [
+        {
+            "user_id": row.partner_id,
+            "username": row.username,
+            "last_message": row.content,
+            "last_message_time": row.last_message_at.isoformat() if row.last_message_at else None,
+            "unread_count": row.unread_count
+        }
+        for row in rows
+    ]
+
+@router.post("/conversations/{user_id}/read")
+async def mark_conversation_read(
+    user_id: int,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # Get unique conversation partners
-    sent_messages = db.query(ChatMessage.recipient_id)\
-                     .filter(ChatMessage.sender_id == current_user.id, ChatMessage.is_private == True)\
-                     .distinct().subquery()
-    
-    received_messages = db.query(ChatMessage.sender_id)\
-                         .filter(ChatMessage.recipient_id == current_user.id, ChatMessage.is_private == True)\
-                         .distinct().subquery()
-    
-    # Combine and get user details
-    conversation_user_ids = db.query(sent_messages.c.recipient_id)\
-                             .union(db.query(received_messages.c.sender_id))\
-                             .distinct().all()
-    
-    conversations = []
-    for (user_id,) in conversation_user_ids:
-        user = db.query(User).filter(User.id == user_id).first()
-        if user:
-            # Get last message
-            last_message = db.query(ChatMessage)\
-                           .filter(
-                               ((ChatMessage.sender_id == current_user.id) & (ChatMessage.recipient_id == user_id)) |
-                               ((ChatMessage.sender_id == user_id) & (ChatMessage.recipient_id == current_user.id)),
-                               ChatMessage.is_private == True,
-                               ChatMessage.is_deleted == False
-                           )\
-                           .order_by(desc(ChatMessage.created_at))\
-                           .first()
-            
-            conversations.append({
-                "user_id": user.id,
-                "username": user.username,
-                "last_message": last_message.content if last_message else None,
-                "last_message_time": last_message.created_at.isoformat() if last_message else None,
-                "unread_count": 0  # TODO: Implement unread count
-            })
-    
-    return conversations
+    result = await db.execute(
+        update(Conversation)
+        .where(Conversation.user_id == current_user.id, Conversation.partner_id == user_id)
+        .values(unread_count=0)
+    )
+    if result.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    await db.commit()
+    
+    # Clear the badge in the reader's other open sessions
+    await manager.send_personal_message({"type": "conversation_read", "user_id": user_id}, current_user.id)
+    
+    return {"message": "Conversation marked as read"}
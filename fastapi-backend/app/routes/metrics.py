@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException
+from ..core.database import engine, async_engine, pool_status
+from ..models import User
+from ..utils.auth import get_current_user_async
+from ..utils.broadcast import manager
+from ..utils.hashing import hashing_pool
+
+async def _require_admin(current_user: User = Depends(get_current_user_async)):
+    # Pool, queue and socket internals are for operators only
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+router = APIRouter(dependencies=[Depends(_require_admin)])
+
+@router.get("/db")
+async def get_db_pool_metrics():
+    """Connection pool occupancy and checkout wait times for sizing the pool"""
+    return {
+        "sync": pool_status(engine),
+        "async": pool_status(async_engine.sync_engine),
+    }
+
+@router.get("/hashing")
+async def get_hashing_metrics():
+    """Password hashing queue depth, rejections and bcrypt latency"""
+    return hashing_pool.snapshot()
+
+@router.get("/websocket")
+async def get_websocket_metrics():
+    """Connected sockets, fan-out time, delivery latency and dropped clients for this worker"""
+    return {
+        "connections": len(manager.active_connections),
+        **manager.metrics.snapshot(),
+    }
@@ -1,11 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from ..core.database import get_db
-from ..models import User, Team, Challenge, Submission
-from ..utils.auth import get_current_user
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, desc, literal, literal_column
+from ..core.database import get_db, get_async_db
+from ..models import User, Team, Challenge, Solve, WaveScore, ScoreHistory
+from ..utils.auth import get_current_user, get_current_user_async, get_optional_user_async
+from ..utils.broadcast import manager
+from ..utils.platform_stats import platform_stats
+from ..utils.response_cache import scoreboard_responses
+from ..utils.scoreboard import scoreboard_cache
+from ..utils.scoreboard_freeze import scoreboard_freeze
+from ..utils.scoreboard_push import scoreboard_pusher
 from pydantic import BaseModel
 from typing import List, Optional
+from redis import RedisError
+from datetime import datetime
+from itertools import accumulate
 import json
 
 router = APIRouter()
@@ -28,58 +39,117 @@ class TeamScoreboardEntry(BaseModel):
     solves: int
     last_solve: Optional[str]
 
+def _sees_live(viewer: Optional[User]) -> bool:
+    # Admins keep seeing the live boards while the public ones are frozen
+    return viewer is not None and viewer.role == "admin"
+
+def _frozen_individual(frozen: dict, team_id: Optional[int], limit: int) -> List[ScoreboardEntry]:
+    rows = [row for row in frozen["individual"] if team_id is None or row[2] == team_id]
+    return [
+        ScoreboardEntry(rank=rank, id=row[0], username=row[1], team_name=row[3],
+                        points=row[4], solves=row[5], last_solve=row[6])
+        for rank, row in enumerate(rows[:limit], 1)
+    ]
+
+def _frozen_teams(frozen: dict, limit: int) -> List[TeamScoreboardEntry]:
+    return [
+        TeamScoreboardEntry(rank=rank, id=row[0], name=row[1], member_count=row[2],
+                            total_points=row[3], solves=row[4], last_solve=row[5])
+        for rank, row in enumerate(frozen["teams"][:limit], 1)
+    ]
+
 @router.get("/individual", response_model=List[ScoreboardEntry])
 async def get_individual_scoreboard(
+    request: Request,
     wave: Optional[str] = None,
-    limit: int = 50,
-    db: Session = Depends(get_db)
+    team_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=100),
+    viewer: Optional[User] = Depends(get_optional_user_async)
 ):
-    query = db.query(
-        User.id,
-        User.username,
-        Team.name.label('team_name'),
-        User.points,
-        User.solves,
-        User.last_solve
-    ).outerjoin(Team, User.team_id == Team.id).filter(User.is_blocked == False)
+    if wave and team_id:
+        raise HTTPException(status_code=400, detail="Filter by wave or by team, not both")
     
-    if wave:
-        # Filter by wave-specific challenges
-        wave_challenges = db.query(Challenge.id).filter(Challenge.wave == wave).subquery()
-        wave_solves = db.query(
-            Submission.user_id,
-            func.count(Submission.id).label('wave_solves'),
-            func.sum(Challenge.points).label('wave_points')
-        ).join(Challenge, Submission.challenge_id == Challenge.id)\
-         .filter(Submission.challenge_id.in_(wave_challenges))\
-         .group_by(Submission.user_id).subquery()
-        
-        query = query.outerjoin(wave_solves, User.id == wave_solves.c.user_id)\
-                    .add_columns(wave_solves.c.wave_points, wave_solves.c.wave_solves)
+    live = _sees_live(viewer)
+    return await scoreboard_responses.respond(
+        request,
+        f"{'live:' if live else ''}individual:{wave}:{team_id}:{limit}",
+        lambda db: _individual_scoreboard(db, wave, team_id, limit, live)
+    )
+
+async def _individual_scoreboard(db: AsyncSession, wave: Optional[str], team_id: Optional[int], limit: int,
+                                 live: bool = False):
+    try:
+        frozen = None if live else await run_in_threadpool(scoreboard_freeze.load, wave)
+        if frozen is not None:
+            return _frozen_individual(frozen, team_id, limit)
+        entries = await run_in_threadpool(scoreboard_cache.top_users, limit, wave=wave, team_id=team_id)
+    except RedisError:
+        return await _individual_scoreboard_from_db(db, wave, team_id, limit)
+    
+    # Resolve display names for the ranked ids in a single primary-key lookup
+    ids = [entry[0] for entry in entries]
+    names = {
+        row.id: row for row in (await db.execute(
+            select(User.id, User.username, Team.name.label('team_name'))
+            .outerjoin(Team, User.team_id == Team.id)
+            .filter(User.id.in_(ids), User.is_blocked == False)
+        )).all()
+    } if ids else {}
     
+    scoreboard = []
+    for user_id, points, solves, last_solve in entries:
+        if user_id not in names:
+            continue
+        scoreboard.append(ScoreboardEntry(
+            rank=len(scoreboard) + 1,
+            id=user_id,
+            username=names[user_id].username,
+            team_name=names[user_id].team_name,
+            points=points,
+            solves=solves,
+            last_solve=last_solve.isoformat() if last_solve else None
+        ))
+    
+    return scoreboard
+
+async def _individual_scoreboard_from_db(db: AsyncSession, wave: Optional[str], team_id: Optional[int], limit: int):
     if wave:
-        query = query.order_by(desc('wave_points'), desc('wave_solves'), desc(User.points))
+        # Indexed range scan over the wave's rows in rank order
+        query = select(
+            User.id,
+            User.username,
+            Team.name.label('team_name'),
+            WaveScore.points,
+            WaveScore.solves,
+            WaveScore.last_solve
+        ).join(User, WaveScore.entity_id == User.id)\
+         .filter(WaveScore.wave == wave, WaveScore.entity_type == "user")\
+         .order_by(desc(WaveScore.points), desc(WaveScore.solves), desc(WaveScore.last_solve))
     else:
-        query = query.order_by(desc(User.points), desc(User.solves), User.last_solve.desc().nulls_last())
+        query = select(
+            User.id,
+            User.username,
+            Team.name.label('team_name'),
+            User.points,
+            User.solves,
+            User.last_solve
+        ).order_by(desc(User.points), desc(User.solves), User.last_solve.desc().nulls_last())
+    query = query.outerjoin(Team, User.team_id == Team.id).filter(User.is_blocked == False)
+    
+    if team_id:
+        query = query.filter(User.team_id == team_id)
     
-    results = query.limit(limit).all()
+    results = (await db.execute(query.limit(limit))).all()
     
     scoreboard = []
     for i, result in enumerate(results, 1):
-        if wave:
-            points = result.wave_points or 0
-            solves = result.wave_solves or 0
-        else:
-            points = result.points
-            solves = result.solves
-            
         scoreboard.append(ScoreboardEntry(
             rank=i,
             id=result.id,
             username=result.username,
             team_name=result.team_name,
-            points=points,
-            solves=solves,
+            points=result.points,
+            solves=result.solves,
             last_solve=result.last_solve.isoformat() if result.last_solve else None
         ))
     
@@ -87,125 +157,382 @@ async def get_individual_scoreboard(
 
 @router.get("/teams", response_model=List[TeamScoreboardEntry])
 async def get_team_scoreboard(
+    request: Request,
     wave: Optional[str] = None,
-    limit: int = 50,
-    db: Session = Depends(get_db)
+    limit: int = Query(50, ge=1, le=100),
+    viewer: Optional[User] = Depends(get_optional_user_async)
 ):
-    query = db.query(
-        Team.id,
-        Team.name,
-        Team.total_points,
-        func.count(User.id).label('member_count'),
-        Team.solves,
-        Team.last_solve
-    ).join(User, Team.id == User.team_id)\
-     .filter(User.is_blocked == False)\
-     .group_by(Team.id, Team.name, Team.total_points, Team.solves, Team.last_solve)
+    live = _sees_live(viewer)
+    return await scoreboard_responses.respond(
+        request,
+        f"{'live:' if live else ''}teams:{wave}:{limit}",
+        lambda db: _team_scoreboard(db, wave, limit, live)
+    )
+
+async def _team_scoreboard(db: AsyncSession, wave: Optional[str], limit: int, live: bool = False):
+    try:
+        frozen = None if live else await run_in_threadpool(scoreboard_freeze.load, wave)
+        if frozen is not None:
+            return _frozen_teams(frozen, limit)
+        entries = await run_in_threadpool(scoreboard_cache.top_teams, limit, wave=wave)
+    except RedisError:
+        return await _team_scoreboard_from_db(db, wave, limit)
     
-    if wave:
-        # Filter by wave-specific challenges
-        wave_challenges = db.query(Challenge.id).filter(Challenge.wave == wave).subquery()
-        wave_team_stats = db.query(
-            Team.id,
-            func.sum(Challenge.points).label('wave_points'),
-            func.count(Submission.id).label('wave_solves')
-        ).join(User, Team.id == User.team_id)\
-         .join(Submission, User.id == Submission.user_id)\
-         .join(Challenge, Submission.challenge_id == Challenge.id)\
-         .filter(Submission.challenge_id.in_(wave_challenges))\
-         .group_by(Team.id).subquery()
-        
-        query = query.outerjoin(wave_team_stats, Team.id == wave_team_stats.c.id)\
-                    .add_columns(wave_team_stats.c.wave_points, wave_team_stats.c.wave_solves)
+    ids = [entry[0] for entry in entries]
+    teams = {
+        row.id: row for row in (await db.execute(
+            select(Team.id, Team.name, func.count(User.id).label('member_count'))
+            .join(User, Team.id == User.team_id)
+            .filter(Team.id.in_(ids), User.is_blocked == False)
+            .group_by(Team.id, Team.name)
+        )).all()
+    } if ids else {}
     
+    scoreboard = []
+    for team_id, points, solves, last_solve in entries:
+        if team_id not in teams:
+            continue
+        scoreboard.append(TeamScoreboardEntry(
+            rank=len(scoreboard) + 1,
+            id=team_id,
+            name=teams[team_id].name,
+            total_points=points,
+            member_count=teams[team_id].member_count,
+            solves=solves,
+            last_solve=last_solve.isoformat() if last_solve else None
+        ))
+    
+    return scoreboard
+
+async def _team_scoreboard_from_db(db: AsyncSession, wave: Optional[str], limit: int):
     if wave:
-        query = query.order_by(desc('wave_points'), desc('wave_solves'), desc(Team.total_points))
+        # Indexed range scan over the wave's rows; members are counted per returned team
+        member_count = select(func.count(User.id))\
+            .filter(User.team_id == Team.id, User.is_blocked == False)\
+            .correlate(Team).scalar_subquery()
+        query = select(
+            Team.id,
+            Team.name,
+            WaveScore.points.label('total_points'),
+            member_count.label('member_count'),
+            WaveScore.solves,
+            WaveScore.last_solve
+        ).join(Team, WaveScore.entity_id == Team.id)\
+         .filter(WaveScore.wave == wave, WaveScore.entity_type == "team")\
+         .order_by(desc(WaveScore.points), desc(WaveScore.solves), desc(WaveScore.last_solve))
     else:
-        query = query.order_by(desc(Team.total_points), desc(Team.solves), Team.last_solve.desc().nulls_last())
+        query = select(
+            Team.id,
+            Team.name,
+            Team.total_points,
+            func.count(User.id).label('member_count'),
+            Team.solves,
+            Team.last_solve
+        ).join(User, Team.id == User.team_id)\
+         .filter(User.is_blocked == False)\
+         .group_by(Team.id, Team.name, Team.total_points, Team.solves, Team.last_solve)\
+         .order_by(desc(Team.total_points), desc(Team.solves), Team.last_solve.desc().nulls_last())
     
-    results = query.limit(limit).all()
+    results = (await db.execute(query.limit(limit))).all()
     
     scoreboard = []
     for i, result in enumerate(results, 1):
-        if wave:
-            points = result.wave_points or 0
-            solves = result.wave_solves or 0
-        else:
-            points = result.total_points
-            solves = result.solves
-            
         scoreboard.append(TeamScoreboardEntry(
             rank=i,
             id=result.id,
             name=result.name,
-            total_points=points,
+            total_points=result.total_points,
             member_count=result.member_count,
-            solves=solves,
+            solves=result.solves,
             last_solve=result.last_solve.isoformat() if result.last_solve else None
         ))
     
     return scoreboard
 
+@router.post("/rebuild")
+def rebuild_scoreboard(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    groups = scoreboard_cache.rebuild(db)
+    platform_stats.reset()
+    scoreboard_pusher.mark_dirty()
+    scoreboard_responses.invalidate()
+    return {"message": "Scoreboard rebuilt", "solve_groups": groups}
+
+@router.get("/freeze")
+async def get_freeze_status(current_user: User = Depends(get_current_user_async)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    return {"frozen": scoreboard_freeze.scopes()}
+
+@router.post("/freeze")
+async def freeze_scoreboard(
+    wave: Optional[str] = None,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Serve the current rankings to the public until unfrozen.
+
+    Without `wave`, the global board and every wave board are frozen.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    try:
+        scopes = await scoreboard_freeze.freeze(
+            db, wave,
+            stats=None if wave else await platform_stats.snapshot(db),
+            waves=await _wave_scoreboards(db)
+        )
+    except RedisError:
+        raise HTTPException(status_code=503, detail="Scoreboard store unavailable")
+    scoreboard_responses.invalidate()
+    return {"message": "Scoreboard frozen", "frozen": scopes}
+
+@router.delete("/freeze")
+async def unfreeze_scoreboard(
+    wave: Optional[str] = None,
+    current_user: User = Depends(get_current_user_async)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    scoreboard_freeze.unfreeze(wave)
+    scoreboard_pusher.mark_dirty()
+    scoreboard_responses.invalidate()
+    return {"message": "Scoreboard unfrozen", "frozen": scoreboard_freeze.scopes()}
+
+@router.websocket("/ws")
+async def scoreboard_websocket(websocket: WebSocket):
+    """Public live scoreboard: one snapshot frame, then coalesced rank deltas.
+
+    Replaces polling /individual and /teams; see ScoreboardPusher for the
+    frame format. Inbound frames are ignored.
+    """
+    await manager.connect(websocket, None, topics={"scoreboard"})
+    try:
+        manager.reply(websocket, await scoreboard_pusher.snapshot())
+        while True:
+            await websocket.receive_text()
+    except RedisError:
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.disconnect(websocket)
+
 @router.get("/stats")
-async def get_scoreboard_stats(db: Session = Depends(get_db)):
-    # Overall statistics
-    total_users = db.query(User).filter(User.is_blocked == False).count()
-    total_teams = db.query(Team).count()
-    total_challenges = db.query(Challenge).filter(Challenge.is_active == True).count()
-    total_solves = db.query(Submission).count()
-    
-    # Top performers
-    top_user = db.query(User).filter(User.is_blocked == False)\
-                            .order_by(desc(User.points)).first()
-    top_team = db.query(Team).order_by(desc(Team.total_points)).first()
-    
-    # Recent activity
-    recent_solves = db.query(Submission)\
-                     .join(User, Submission.user_id == User.id)\
-                     .join(Challenge, Submission.challenge_id == Challenge.id)\
-                     .order_by(desc(Submission.created_at))\
-                     .limit(10).all()
+async def get_scoreboard_stats(
+    request: Request,
+    viewer: Optional[User] = Depends(get_optional_user_async)
+):
+    live = _sees_live(viewer)
+    return await scoreboard_responses.respond(
+        request,
+        f"{'live:' if live else ''}stats",
+        lambda db: _scoreboard_stats(db, live)
+    )
+
+async def _scoreboard_stats(db: AsyncSession, live: bool):
+    try:
+        frozen = None if live else await run_in_threadpool(scoreboard_freeze.load)
+    except RedisError:
+        frozen = None
+    if frozen is not None and "stats" in frozen:
+        # Counters, leaders and the activity feed as they stood at the freeze
+        return {**frozen["stats"], "frozen_at": frozen["frozen_at"]}
+    return await platform_stats.snapshot(db)
+
+@router.get("/timeline")
+async def get_score_timeline(
+    request: Request,
+    top: int = Query(10, ge=1, le=50),
+    resolution: int = Query(300, ge=10, le=86400),
+    viewer: Optional[User] = Depends(get_optional_user_async)
+):
+    live = _sees_live(viewer)
+    return await scoreboard_responses.respond(
+        request,
+        f"{'live:' if live else ''}timeline:{top}:{resolution}",
+        lambda db: _score_timeline(db, top, resolution, live)
+    )
+
+async def _score_timeline(db: AsyncSession, top: int, resolution: int, live: bool):
+    """Cumulative score of the top teams, one point per `resolution`-second bucket with changes.
+
+    Each series is a list of [unix_time, total] pairs taken at bucket ends.
+    History times are stored as naive UTC, so the epoch offset is taken with
+    TIMESTAMPDIFF rather than UNIX_TIMESTAMP(), which reads them in the
+    session time zone.
+    """
+    until = None
+    try:
+        frozen = None if live else await run_in_threadpool(scoreboard_freeze.load)
+        if frozen is not None:
+            teams = [(row[0], row[1]) for row in frozen["teams"][:top]]
+            until = datetime.fromisoformat(frozen["frozen_at"])
+        else:
+            ids = [entry[0] for entry in await run_in_threadpool(scoreboard_cache.top_teams, top)]
+            names = dict((await db.execute(
+                select(Team.id, Team.name).filter(Team.id.in_(ids))
+            )).all()) if ids else {}
+            teams = [(team_id, names[team_id]) for team_id in ids if team_id in names]
+    except RedisError:
+        teams = (await db.execute(
+            select(Team.id, Team.name).order_by(desc(Team.total_points)).limit(top)
+        )).all()
+    
+    # Deltas are summed per (team, bucket) by the database over the covering
+    # index, so only the bucketed rows come back to be accumulated here
+    buckets = {}
+    if teams:
+        epoch = func.timestampdiff(literal_column("SECOND"), literal("1970-01-01 00:00:00"), ScoreHistory.created_at)
+        bucket = func.floor(epoch / resolution)
+        query = select(ScoreHistory.team_id, bucket.label('bucket'), func.sum(ScoreHistory.delta))\
+            .filter(ScoreHistory.team_id.in_([team_id for team_id, _ in teams]))\
+            .group_by(ScoreHistory.team_id, bucket)\
+            .order_by(ScoreHistory.team_id, bucket)
+        if until is not None:
+            query = query.filter(ScoreHistory.created_at <= until)
+        for team_id, index, delta in (await db.execute(query)).all():
+            times, deltas = buckets.setdefault(team_id, ([], []))
+            times.append((int(index) + 1) * resolution)
+            deltas.append(int(delta or 0))
+    
+    series = []
+    for team_id, name in teams:
+        times, deltas = buckets.get(team_id, ([], []))
+        series.append({
+            "id": team_id,
+            "name": name,
+            "points": [list(point) for point in zip(times, accumulate(deltas))]
+        })
     
     return {
-        "total_users": total_users,
-        "total_teams": total_teams,
-        "total_challenges": total_challenges,
-        "total_solves": total_solves,
-        "top_user": {
-            "username": top_user.username if top_user else None,
-            "points": top_user.points if top_user else 0
-        },
-        "top_team": {
-            "name": top_team.name if top_team else None,
-            "points": top_team.total_points if top_team else 0
-        },
-        "recent_activity": [
-            {
-                "username": solve.user.username,
-                "challenge_title": solve.challenge.title,
-                "points": solve.points_awarded,
-                "timestamp": solve.created_at.isoformat()
-            } for solve in recent_solves
-        ]
+        "resolution": resolution,
+        "until": until.isoformat() if until else None,
+        "series": series
     }
 
 @router.get("/waves")
-async def get_wave_scoreboards(db: Session = Depends(get_db)):
-    waves = db.query(Challenge.wave).distinct().all()
-    wave_list = [wave[0] for wave in waves if wave[0]]
+async def get_wave_scoreboards(
+    request: Request,
+    viewer: Optional[User] = Depends(get_optional_user_async)
+):
+    live = _sees_live(viewer)
+    return await scoreboard_responses.respond(
+        request,
+        f"{'live:' if live else ''}waves",
+        lambda db: _visible_wave_scoreboards(db, live)
+    )
+
+async def _visible_wave_scoreboards(db: AsyncSession, live: bool):
+    if live:
+        return await _wave_scoreboards(db)
+    try:
+        frozen = await run_in_threadpool(scoreboard_freeze.load)
+    except RedisError:
+        frozen = None
+    if frozen is not None and "waves" in frozen:
+        return frozen["waves"]
+    
+    waves = await _wave_scoreboards(db)
+    try:
+        frozen_waves = await run_in_threadpool(scoreboard_freeze.load_waves, list(waves))
+    except RedisError:
+        frozen_waves = {}
+    for wave, blob in frozen_waves.items():
+        if "wave_stats" not in blob:
+            continue
+        if blob["wave_stats"] is None:
+            # The wave had no challenges yet when it was frozen
+            del waves[wave]
+        else:
+            waves[wave] = blob["wave_stats"]
+    return waves
+
+async def _wave_scoreboards(db: AsyncSession):
+    # Three grouped queries however many waves there are: per-challenge
+    # solve counts, distinct solvers per wave, and each challenge's first blood
+    challenge_rows = (await db.execute(
+        select(
+            Challenge.id,
+            Challenge.title,
+            Challenge.wave,
+            Challenge.points,
+            Challenge.is_active,
+            func.count(Solve.id).label('solves')
+        ).outerjoin(Solve, Solve.challenge_id == Challenge.id)
+         .filter(Challenge.wave != None)
+         .group_by(Challenge.id, Challenge.title, Challenge.wave, Challenge.points, Challenge.is_active)
+         .order_by(Challenge.wave, Challenge.id)
+    )).all()
+    
+    unique_solvers = dict((await db.execute(
+        select(Challenge.wave, func.count(func.distinct(Solve.user_id)))
+        .join(Challenge, Solve.challenge_id == Challenge.id)
+        .filter(Challenge.wave != None)
+        .group_by(Challenge.wave)
+    )).all())
+    
+    first_solve = select(
+        Solve.challenge_id,
+        func.min(Solve.solved_at).label('solved_at')
+    ).group_by(Solve.challenge_id).subquery()
+    first_bloods = {}
+    for row in (await db.execute(
+        select(Solve.challenge_id, User.username, Solve.solved_at)
+        .join(first_solve, (Solve.challenge_id == first_solve.c.challenge_id) & (Solve.solved_at == first_solve.c.solved_at))
+        .join(User, Solve.user_id == User.id)
+        .order_by(Solve.id)
+    )).all():
+        # Same-second ties go to the earlier insert
+        first_bloods.setdefault(row.challenge_id, row)
     
     wave_stats = {}
-    for wave in wave_list:
-        wave_challenges = db.query(Challenge).filter(Challenge.wave == wave, Challenge.is_active == True).all()
-        wave_solves = db.query(Submission)\
-                       .join(Challenge, Submission.challenge_id == Challenge.id)\
-                       .filter(Challenge.wave == wave).count()
+    for row in challenge_rows:
+        stats = wave_stats.setdefault(row.wave, {
+            "challenges": 0,
+            "total_points": 0,
+            "solves": 0,
+            "unique_solvers": unique_solvers.get(row.wave, 0),
+            "completion_rate": 0,
+            "first_blood": None,
+            "challenge_stats": []
+        })
+        stats["solves"] += row.solves
         
-        wave_stats[wave] = {
-            "challenges": len(wave_challenges),
-            "total_points": sum(c.points for c in wave_challenges),
-            "solves": wave_solves,
-            "completion_rate": wave_solves / len(wave_challenges) if wave_challenges else 0
-        }
+        blood = first_bloods.get(row.id)
+        if blood and (stats["first_blood"] is None or blood.solved_at < stats["first_blood"]["solved_at"]):
+            stats["first_blood"] = {
+                "username": blood.username,
+                "challenge_title": row.title,
+                "solved_at": blood.solved_at
+            }
+        
+        if not row.is_active:
+            continue
+        stats["challenges"] += 1
+        stats["total_points"] += row.points or 0
+        stats["challenge_stats"].append({
+            "id": row.id,
+            "title": row.title,
+            "points": row.points,
+            "solves": row.solves,
+            "first_blood": {
+                "username": blood.username,
+                "solved_at": blood.solved_at.isoformat()
+            } if blood else None
+        })
+    
+    for stats in wave_stats.values():
+        stats["completion_rate"] = stats["solves"] / stats["challenges"] if stats["challenges"] else 0
+        if stats["first_blood"]:
+            stats["first_blood"]["solved_at"] = stats["first_blood"]["solved_at"].isoformat()
     
     return wave_stats
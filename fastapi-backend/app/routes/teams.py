@@ -1,12 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from ..core.database import get_db
-from ..models import Team, User
+from ..models import Team, User, WaveScore
 from ..utils.auth import get_current_user
+from ..utils.platform_stats import platform_stats
+from ..utils.response_cache import scoreboard_responses
+from ..utils.scoreboard import scoreboard_cache
+from ..utils.scoreboard_push import scoreboard_pusher
+from ..utils.user_cache import user_cache
 from pydantic import BaseModel
 from typing import List, Optional
+from redis import RedisError
+import logging
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 class TeamCreate(BaseModel):
     name: str
@@ -23,7 +31,7 @@ class TeamResponse(BaseModel):
     rank: int
 
 @router.get("/", response_model=List[TeamResponse])
-async def get_teams(
+def get_teams(
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_user),
@@ -33,7 +41,7 @@ async def get_teams(
     return teams
 
 @router.get("/{team_id}", response_model=TeamResponse)
-async def get_team(
+def get_team(
     team_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -44,7 +52,7 @@ async def get_team(
     return team
 
 @router.post("/", response_model=TeamResponse)
-async def create_team(
+def create_team(
     team_data: TeamCreate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -58,11 +66,12 @@ async def create_team(
     team = Team(name=team_data.name)
     db.add(team)
     db.commit()
+    platform_stats.incr("total_teams")
     db.refresh(team)
     return team
 
 @router.put("/{team_id}", response_model=TeamResponse)
-async def update_team(
+def update_team(
     team_id: int,
     team_update: TeamUpdate,
     current_user: User = Depends(get_current_user),
@@ -83,7 +92,7 @@ async def update_team(
     return team
 
 @router.delete("/{team_id}")
-async def delete_team(
+def delete_team(
     team_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -95,6 +104,19 @@ async def delete_team(
     if not team:
         raise HTTPException(status_code=404, detail="Team not found")
     
+    # Members are detached by ON DELETE SET NULL, which the session never sees
+    member_ids = [member_id for member_id, in db.query(User.id).filter(User.team_id == team_id)]
+    db.query(WaveScore).filter(WaveScore.entity_type == "team", WaveScore.entity_id == team_id)\
+        .delete(synchronize_session=False)
     db.delete(team)
     db.commit()
+    user_cache.invalidate_many(member_ids)
+    platform_stats.incr("total_teams", -1)
+    try:
+        scoreboard_cache.remove_team(team_id)
+        scoreboard_pusher.mark_dirty()
+        scoreboard_responses.invalidate()
+    except RedisError:
+        # The board can be regenerated with `python -m app.utils.scoreboard rebuild`
+        logger.exception("Failed to remove deleted team %s from the scoreboard", team_id)
     return {"message": "Team deleted successfully"}
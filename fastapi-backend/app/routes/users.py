@@ -3,10 +3,18 @@ from sqlalchemy.orm import Session
 from ..core.database import get_db
 from ..models import User, Team
 from ..utils.auth import get_current_user
+from ..utils.platform_stats import platform_stats
+from ..utils.response_cache import scoreboard_responses
+from ..utils.scoreboard import scoreboard_cache
+from ..utils.scoreboard_push import scoreboard_pusher
+from ..utils.tokens import revocation_list
 from pydantic import BaseModel
 from typing import List, Optional
+from redis import RedisError
+import logging
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 class UserUpdate(BaseModel):
     username: Optional[str] = None
@@ -32,11 +40,11 @@ class UserResponse(BaseModel):
     created_at: str
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_profile(current_user: User = Depends(get_current_user)):
+def get_current_user_profile(current_user: User = Depends(get_current_user)):
     return current_user
 
 @router.put("/me", response_model=UserResponse)
-async def update_current_user_profile(
+def update_current_user_profile(
     user_update: UserUpdate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -57,7 +65,7 @@ async def update_current_user_profile(
     return current_user
 
 @router.get("/", response_model=List[UserResponse])
-async def get_users(
+def get_users(
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_user),
@@ -70,7 +78,7 @@ async def get_users(
     return users
 
 @router.get("/{user_id}", response_model=UserResponse)
-async def get_user(
+def get_user(
     user_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -84,7 +92,7 @@ async def get_user(
     return user
 
 @router.put("/{user_id}", response_model=UserResponse)
-async def update_user(
+def update_user(
     user_id: int,
     user_update: UserUpdate,
     current_user: User = Depends(get_current_user),
@@ -97,6 +105,7 @@ async def update_user(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    old_team_id = user.team_id
     for field, value in user_update.dict(exclude_unset=True).items():
         if field == "username" and value != user.username:
             # Check if username is taken
@@ -110,10 +119,26 @@ async def update_user(
     
     db.commit()
     db.refresh(user)
+    if user.team_id != old_team_id and not user.is_blocked:
+        try:
+            scoreboard_cache.move_user(user.id, old_team_id, user.team_id)
+            scoreboard_pusher.mark_dirty()
+            scoreboard_responses.invalidate()
+        except RedisError:
+            # The board can be regenerated with `python -m app.utils.scoreboard rebuild`
+            logger.exception("Failed to move user %s between team boards", user.id)
     return user
 
+def _revoke_tokens(user_id: int):
+    try:
+        revocation_list.revoke_user(user_id)
+    except RedisError:
+        # Other workers miss the revocation, but they refuse the user anyway:
+        # the auth dependencies reject blocked and deleted users
+        logger.exception("Failed to publish token revocation for user %s", user_id)
+
 @router.delete("/{user_id}")
-async def delete_user(
+def delete_user(
     user_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -125,12 +150,23 @@ async def delete_user(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    team_id, was_blocked = user.team_id, user.is_blocked
     db.delete(user)
     db.commit()
+    if not was_blocked:
+        platform_stats.incr("total_users", -1)
+    _revoke_tokens(user_id)
+    try:
+        scoreboard_cache.remove_user(user_id, team_id)
+        scoreboard_pusher.mark_dirty()
+        scoreboard_responses.invalidate()
+    except RedisError:
+        # The board can be regenerated with `python -m app.utils.scoreboard rebuild`
+        logger.exception("Failed to remove deleted user %s from the scoreboard", user_id)
     return {"message": "User deleted successfully"}
 
 @router.post("/{user_id}/block")
-async def block_user(
+def block_user(
     user_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -142,12 +178,23 @@ async def block_user(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    was_blocked = user.is_blocked
     user.is_blocked = True
     db.commit()
+    _revoke_tokens(user.id)
+    if not was_blocked:
+        platform_stats.incr("total_users", -1)
+        try:
+            scoreboard_cache.remove_user(user.id, user.team_id)
+            scoreboard_pusher.mark_dirty()
+            scoreboard_responses.invalidate()
+        except RedisError:
+            # The board can be regenerated with `python -m app.utils.scoreboard rebuild`
+            logger.exception("Failed to remove blocked user %s from the scoreboard", user.id)
     return {"message": "User blocked successfully"}
 
 @router.post("/{user_id}/unblock")
-async def unblock_user(
+def unblock_user(
     user_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -159,6 +206,17 @@ async def unblock_user(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    was_blocked = user.is_blocked
     user.is_blocked = False
     db.commit()
+    if was_blocked:
+        # restore_user adds the solves back, so only do it for users that were removed
+        platform_stats.incr("total_users")
+        try:
+            scoreboard_cache.restore_user(db, user.id)
+            scoreboard_pusher.mark_dirty()
+            scoreboard_responses.invalidate()
+        except RedisError:
+            # The board can be regenerated with `python -m app.utils.scoreboard rebuild`
+            logger.exception("Failed to restore unblocked user %s on the scoreboard", user.id)
     return {"message": "User unblocked successfully"}
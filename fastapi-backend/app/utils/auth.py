@@ -1,16 +1,26 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional
+import asyncio
+import time
+import uuid
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from ..core.config import settings
-from ..core.database import get_db
+from ..core.database import get_db, get_async_db, AsyncSessionLocal
 from ..models import User
+from .user_cache import user_cache
+from .hashing import hashing_pool
+from .tokens import token_cache, revocation_list
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -18,36 +28,140 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the bounded hashing pool, for use in request handlers"""
+    return await hashing_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await hashing_pool.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # iat keeps sub-second precision for comparison with user revocation times
+    to_encode.update({"exp": expire, "iat": time.time(), "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str) -> Optional[str]:
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+def decode_token(token: str) -> Optional[dict]:
+    # Repeat tokens skip the signature check until their own exp
+    payload = token_cache.get(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            return None
+        if payload.get("sub") is None:
             return None
-        return username
-    except JWTError:
+        token_cache.set(token, payload)
+    if revocation_list.is_revoked(payload):
         return None
+    return payload
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def revoke_token(token: str):
+    payload = decode_token(token)
+    if payload and payload.get("jti"):
+        revocation_list.revoke_token(payload["jti"], payload["exp"])
+
+def verify_token(token: str) -> Optional[str]:
+    payload = decode_token(token)
+    return payload["sub"] if payload else None
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    username = verify_token(token)
-    if username is None:
-        raise credentials_exception
-    user = db.query(User).filter(User.username == username).first()
+
+def _user_lookup(payload: dict):
+    # Tokens carry the user id in "uid"; older tokens only have the username
+    user_id = payload.get("uid")
+    if user_id is not None:
+        return select(User).filter(User.id == user_id)
+    return select(User).filter(User.username == payload["sub"])
+
+# The user dependencies below also refuse blocked users, so a block takes effect
+# on the next request even if the token revocation could not reach Redis;
+# the user cache entry is version-invalidated when the user row changes.
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    payload = decode_token(token)
+    if payload is None:
+        raise _credentials_exception()
+    cached = user_cache.get(payload["uid"]) if "uid" in payload else None
+    if cached is not None:
+        user = db.merge(cached, load=False)
+    else:
+        user = db.execute(_user_lookup(payload)).scalars().first()
+        if user is not None:
+            user_cache.set(user)
+    if user is None or user.username != payload["sub"] or user.is_blocked:
+        raise _credentials_exception()
+    return user
+
+def _decode_cached(token: str):
+    """decode_token plus the user cache lookup; both may reach Redis"""
+    payload = decode_token(token)
+    if payload is None:
+        return None, None
+    return payload, user_cache.get(payload["uid"]) if "uid" in payload else None
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """Async variant of get_current_user for routes running on get_async_db.
+
+    The token and user cache lookups share one trip to the threadpool, so
+    their Redis round trips never block the event loop.
+    """
+    payload, cached = await run_in_threadpool(_decode_cached, token)
+    if payload is None:
+        raise _credentials_exception()
+    if cached is not None:
+        user = await db.merge(cached, load=False)
+    else:
+        user = (await db.execute(_user_lookup(payload))).scalars().first()
+        if user is not None:
+            await run_in_threadpool(user_cache.set, user)
+    if user is None or user.username != payload["sub"] or user.is_blocked:
+        raise _credentials_exception()
+    return user
+
+# In-flight user lookups, so concurrent handshakes for one user share a query
+_pending_lookups: Dict[object, asyncio.Future] = {}
+
+async def _load_user(payload: dict) -> Optional[User]:
+    async with AsyncSessionLocal() as db:
+        user = (await db.execute(_user_lookup(payload))).scalars().first()
+        if user is not None:
+            await run_in_threadpool(user_cache.set, user)
+            db.expunge(user)
+        return user
+
+async def authenticate_token_async(token: str) -> Optional[User]:
+    """Resolve a bearer token to a detached User, or None if it is not valid.
+
+    For long-lived connections that can't hold a request session. Uses the
+    same token and user caches as get_current_user_async, and lookups of one
+    uncached user are coalesced, so a reconnect storm after a deploy costs
+    at most one query per user.
+    """
+    payload, user = await run_in_threadpool(_decode_cached, token)
+    if payload is None:
+        return None
     if user is None:
-        raise credentials_exception
+        key = payload.get("uid") or ("sub", payload["sub"])
+        pending = _pending_lookups.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(_load_user(payload))
+            _pending_lookups[key] = pending
+            pending.add_done_callback(lambda _: _pending_lookups.pop(key, None))
+        user = await asyncio.shield(pending)
+    if user is None or user.username != payload["sub"] or user.is_blocked:
+        return None
     return user
+
+async def get_optional_user_async(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[User]:
+    """The caller of a public route if it sent a valid token, else None"""
+    return await authenticate_token_async(token) if token else None
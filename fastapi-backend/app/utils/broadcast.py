@@ -0,0 +1,381 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+import redis.asyncio as aioredis
+from fastapi import WebSocket
+from redis import RedisError
+from ..core.config import settings
+from ..core.redis import RedisClient, redis_client
+
+logger = logging.getLogger(__name__)
+
+class FanoutMetrics:
+    """Delivery counters and enqueue-to-send latency for WebSocket fan-out"""
+
+    def __init__(self, samples: int = 10000):
+        self.messages = 0
+        self.deliveries = 0
+        self.dropped_clients = 0
+        self.send_errors = 0
+        self.fanout_time_total = 0.0
+        self.fanout_time_max = 0.0
+        self._latencies = deque(maxlen=samples)
+
+    def record_fanout(self, seconds: float):
+        self.messages += 1
+        self.fanout_time_total += seconds
+        self.fanout_time_max = max(self.fanout_time_max, seconds)
+
+    def record_delivery(self, seconds: float):
+        self.deliveries += 1
+        self._latencies.append(seconds)
+
+    def snapshot(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def percentile(pct: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(pct / 100 * len(latencies)))] * 1000, 3)
+
+        return {
+            "messages": self.messages,
+            "deliveries": self.deliveries,
+            "dropped_clients": self.dropped_clients,
+            "send_errors": self.send_errors,
+            "fanout_avg_ms": round(self.fanout_time_total / self.messages * 1000, 3) if self.messages else 0.0,
+            "fanout_max_ms": round(self.fanout_time_max * 1000, 3),
+            "delivery_p50_ms": percentile(50),
+            "delivery_p95_ms": percentile(95),
+            "delivery_p99_ms": percentile(99),
+        }
+
+class Presence:
+    """Cross-worker record of which users have a live WebSocket session.
+
+    Every session is a member of `<prefix>:sessions:<user id>` scored by its
+    expiry, and every online user a member of `<prefix>:online`. Workers
+    re-stamp their sessions on each heartbeat, so sessions of a worker that
+    dies without cleaning up lapse after `ttl` seconds.
+    """
+
+    def __init__(self, redis_client: RedisClient, ttl: int, prefix: str):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.online_key = f"{prefix}:online"
+
+    def sessions_key(self, user_id: int) -> str:
+        return f"{self.prefix}:sessions:{user_id}"
+
+    def refresh(self, sessions: List[Tuple[int, str]]):
+        """Stamp (user id, session id) pairs as live for another `ttl` seconds"""
+        now = time.time()
+        expires_at = now + self.ttl
+        pipe = self.redis.pipeline(transaction=False)
+        for user_id, session_id in sessions:
+            pipe.zadd(self.sessions_key(user_id), {session_id: expires_at})
+            pipe.expire(self.sessions_key(user_id), self.ttl)
+            pipe.zadd(self.online_key, {user_id: expires_at})
+        pipe.zremrangebyscore(self.online_key, "-inf", now)
+        pipe.execute()
+
+    def remove(self, user_id: int, session_id: str):
+        key = self.sessions_key(user_id)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zrem(key, session_id)
+        pipe.zremrangebyscore(key, "-inf", time.time())
+        pipe.zcard(key)
+        _, _, remaining = pipe.execute()
+        if not remaining:
+            # Another worker's heartbeat re-adds the user if a session raced in
+            self.redis.client.zrem(self.online_key, user_id)
+
+    def online_users(self) -> List[int]:
+        return [int(user_id) for user_id in self.redis.client.zrangebyscore(self.online_key, time.time(), "+inf")]
+
+    def session_count(self, user_id: int) -> int:
+        return self.redis.client.zcount(self.sessions_key(user_id), time.time(), "+inf")
+
+class _Connection:
+    """One socket with its own bounded send queue drained by a writer task"""
+
+    def __init__(self, manager: "ConnectionManager", websocket: WebSocket, user_id: Optional[int], team_id: Optional[int]):
+        self.manager = manager
+        self.websocket = websocket
+        self.user_id = user_id
+        self.team_id = team_id
+        self.session_id = uuid.uuid4().hex
+        # Global and team chat are on by default; other topics are opt-in
+        self.topics = {"global", "team"}
+        self.queue: "asyncio.Queue[Tuple[str, float]]" = asyncio.Queue(manager.queue_size)
+        self.writer = asyncio.create_task(self._write())
+
+    async def _write(self):
+        while True:
+            payload, enqueued_at = await self.queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(payload), self.manager.send_timeout)
+            except Exception:
+                self.manager.metrics.send_errors += 1
+                self.manager.drop(self.websocket)
+                return
+            self.manager.metrics.record_delivery(time.perf_counter() - enqueued_at)
+
+class ConnectionManager:
+    """WebSocket registry for this worker, fanned out to all workers via Redis.
+
+    Sends are published to `chat:global`, `chat:team:<id>` or `chat:user:<id>`.
+    Every worker pattern-subscribes to `chat:*` and delivers each message to
+    the matching sockets it holds, so a client gets messages no matter which
+    worker accepted its connection. While the subscription is down, messages
+    are delivered to this worker's sockets directly.
+
+    A message is serialized once and queued on each target socket; every
+    socket has its own writer task, so a slow client only delays itself.
+    Clients whose queue fills up, or whose send times out, are disconnected.
+
+    Clients can mute global or team chat and opt into extra topics, which are
+    published on `chat:topic:<name>`.
+    """
+
+    TOPICS = ("global", "team", "scoreboard")
+
+    def __init__(self, redis_client: RedisClient, redis_url: str, queue_size: int,
+                 send_timeout: float, heartbeat_interval: int, presence_ttl: int, prefix: str = "chat"):
+        self.redis = redis_client
+        self.redis_url = redis_url
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.prefix = prefix
+        self.metrics = FanoutMetrics()
+        self.presence = Presence(redis_client, presence_ttl, f"{prefix}:presence")
+        self.active_connections: Dict[WebSocket, _Connection] = {}
+        self.user_connections: Dict[int, Set[_Connection]] = {}
+        self.team_connections: Dict[int, Set[_Connection]] = {}
+        self.topic_connections: Dict[str, Set[_Connection]] = {}
+        self._listener: Optional[asyncio.Task] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._subscribed = False
+
+    # Channels
+    @property
+    def global_channel(self) -> str:
+        return f"{self.prefix}:global"
+
+    def team_channel(self, team_id: int) -> str:
+        return f"{self.prefix}:team:{team_id}"
+
+    def user_channel(self, user_id: int) -> str:
+        return f"{self.prefix}:user:{user_id}"
+
+    def topic_channel(self, topic: str) -> str:
+        return f"{self.prefix}:topic:{topic}"
+
+    # Local connections
+    async def connect(self, websocket: WebSocket, user_id: Optional[int], team_id: Optional[int] = None,
+                      topics: Optional[Set[str]] = None):
+        """Register a socket; anonymous ones (no user id) only receive `topics`"""
+        await websocket.accept()
+        connection = _Connection(self, websocket, user_id, team_id)
+        self.active_connections[websocket] = connection
+        if topics is not None:
+            connection.topics = set()
+            for topic in topics:
+                self.subscribe(websocket, topic)
+        if team_id is not None:
+            self.team_connections.setdefault(team_id, set()).add(connection)
+        if user_id is None:
+            return
+        self.user_connections.setdefault(user_id, set()).add(connection)
+        try:
+            self.presence.refresh([(user_id, connection.session_id)])
+        except RedisError:
+            logger.warning("Could not record presence for user %s", user_id, exc_info=True)
+
+    def disconnect(self, websocket: WebSocket, user_id: Optional[int] = None):
+        connection = self.active_connections.pop(websocket, None)
+        if connection is None:
+            return
+        if connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+        self._discard(self.user_connections, connection.user_id, connection)
+        if connection.team_id is not None:
+            self._discard(self.team_connections, connection.team_id, connection)
+        for topic in connection.topics:
+            self._discard(self.topic_connections, topic, connection)
+        if connection.user_id is None:
+            return
+        try:
+            self.presence.remove(connection.user_id, connection.session_id)
+        except RedisError:
+            # The session lapses on its own once its TTL passes
+            pass
+
+    @staticmethod
+    def _discard(index: dict, key, connection: _Connection):
+        members = index.get(key)
+        if members is not None:
+            members.discard(connection)
+            if not members:
+                del index[key]
+
+    def drop(self, websocket: WebSocket):
+        """Disconnect a client that cannot keep up"""
+        if websocket not in self.active_connections:
+            return
+        self.disconnect(websocket)
+        self.metrics.dropped_clients += 1
+        asyncio.create_task(self._close(websocket))
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            # 1013: try again later
+            await websocket.close(code=1013)
+        except Exception:
+            pass
+
+    def subscribe(self, websocket: WebSocket, topic: str) -> bool:
+        connection = self.active_connections.get(websocket)
+        if connection is None or topic not in self.TOPICS:
+            return False
+        connection.topics.add(topic)
+        if topic not in ("global", "team"):
+            self.topic_connections.setdefault(topic, set()).add(connection)
+        return True
+
+    def unsubscribe(self, websocket: WebSocket, topic: str) -> bool:
+        connection = self.active_connections.get(websocket)
+        if connection is None or topic not in self.TOPICS:
+            return False
+        connection.topics.discard(topic)
+        self._discard(self.topic_connections, topic, connection)
+        return True
+
+    def _local_targets(self, channel: str) -> List[_Connection]:
+        if channel == self.global_channel:
+            return [connection for connection in self.active_connections.values() if "global" in connection.topics]
+        scope, _, target = channel[len(self.prefix) + 1:].partition(":")
+        if scope == "topic":
+            return list(self.topic_connections.get(target, ()))
+        if not target.isdigit():
+            return []
+        if scope == "team":
+            return [connection for connection in self.team_connections.get(int(target), ()) if "team" in connection.topics]
+        if scope == "user":
+            # Every session the user has open on this worker
+            return list(self.user_connections.get(int(target), ()))
+        return []
+
+    def _deliver(self, channel: str, payload: str):
+        """Queue an already serialized message on every matching local socket"""
+        start = time.perf_counter()
+        for connection in self._local_targets(channel):
+            try:
+                connection.queue.put_nowait((payload, start))
+            except asyncio.QueueFull:
+                self.drop(connection.websocket)
+        self.metrics.record_fanout(time.perf_counter() - start)
+
+    # Sending
+    async def _publish(self, channel: str, message: dict):
+        payload = json.dumps(message)
+        try:
+            self.redis.publish(channel, payload)
+        except RedisError:
+            logger.warning("Could not publish to %s, delivering locally only", channel, exc_info=True)
+            self._deliver(channel, payload)
+            return
+        if not self._subscribed:
+            self._deliver(channel, payload)
+
+    async def broadcast(self, message: dict):
+        await self._publish(self.global_channel, message)
+
+    async def send_to_team(self, message: dict, team_id: int):
+        await self._publish(self.team_channel(team_id), message)
+
+    async def send_personal_message(self, message: dict, user_id: int):
+        await self._publish(self.user_channel(user_id), message)
+
+    async def publish_topic(self, message: dict, topic: str):
+        await self._publish(self.topic_channel(topic), message)
+
+    def reply(self, websocket: WebSocket, message: dict):
+        """Queue a frame for one local socket, behind anything already queued"""
+        connection = self.active_connections.get(websocket)
+        if connection is None:
+            return
+        try:
+            connection.queue.put_nowait((json.dumps(message), time.perf_counter()))
+        except asyncio.QueueFull:
+            self.drop(websocket)
+
+    # Subscription
+    async def _listen(self):
+        while True:
+            client = aioredis.Redis.from_url(self.redis_url, decode_responses=True)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(f"{self.prefix}:*")
+                self._subscribed = True
+                async for item in pubsub.listen():
+                    if item["type"] == "pmessage":
+                        # Payloads are published pre-serialized and forwarded as is
+                        self._deliver(item["channel"], item["data"])
+            except (RedisError, OSError):
+                logger.warning("Chat subscription lost, reconnecting", exc_info=True)
+            finally:
+                self._subscribed = False
+                await pubsub.aclose()
+                await client.aclose()
+            await asyncio.sleep(1)
+
+    # Presence
+    async def _beat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            # Anonymous sockets (public scoreboard viewers) have no presence
+            sessions = [
+                (connection.user_id, connection.session_id)
+                for connection in self.active_connections.values() if connection.user_id is not None
+            ]
+            try:
+                self.presence.refresh(sessions)
+            except RedisError:
+                logger.warning("Presence heartbeat failed", exc_info=True)
+
+    def online_users(self) -> List[int]:
+        return self.presence.online_users()
+
+    def start(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._beat())
+
+    async def stop(self):
+        for task in (self._listener, self._heartbeat):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._listener = self._heartbeat = None
+
+# Global connection manager instance
+manager = ConnectionManager(
+    redis_client,
+    settings.REDIS_URL,
+    settings.WS_SEND_QUEUE_SIZE,
+    settings.WS_SEND_TIMEOUT,
+    settings.PRESENCE_HEARTBEAT_INTERVAL,
+    settings.PRESENCE_TTL,
+)
@@ -0,0 +1,136 @@
+import hashlib
+import hmac
+import re
+import secrets
+import threading
+import time
+from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+from redis import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings
+from ..core.redis import RedisClient, redis_client
+from ..models import Challenge
+
+FLAG_FORMATS = ("exact", "case_insensitive", "regex")
+
+def _digest(salt: str, flag: str) -> str:
+    return hashlib.sha256(f"{salt}{flag}".encode()).hexdigest()
+
+def hash_flag(flag: str, flag_format: str = "exact") -> str:
+    """Encode a flag for storage in Challenge.flag_hash.
+
+    exact            sha256$<salt>$<hex>
+    case_insensitive sha256i$<salt>$<hex>   (hash of the lowercased flag)
+    regex            regex$<pattern>        (full match)
+    """
+    if flag_format == "regex":
+        re.compile(flag)
+        return f"regex${flag}"
+    salt = secrets.token_hex(8)
+    if flag_format == "case_insensitive":
+        return f"sha256i${salt}${_digest(salt, flag.lower())}"
+    return f"sha256${salt}${_digest(salt, flag)}"
+
+class FlagVerifier:
+    """Precomputed checker for one challenge's flag plus the submit-time fields"""
+
+    def __init__(self, challenge_id: int, flag_hash: Optional[str], is_active: bool,
+                 max_attempts: int, points: int, wave: Optional[str], title: Optional[str] = None,
+                 dynamic: bool = False, legacy_flag: Optional[str] = None):
+        self.challenge_id = challenge_id
+        self.is_active = is_active
+        self.max_attempts = max_attempts or 0
+        self.points = points
+        self.wave = wave
+        self.title = title
+        self.dynamic = bool(dynamic)
+        if flag_hash:
+            self._kind, self._salt, self._expected, self._pattern = self._parse(flag_hash)
+        else:
+            # Rows created before flag_hash keep the plaintext flag in Challenge.flag
+            self._kind, self._salt, self._expected, self._pattern = "plain", None, legacy_flag, None
+
+    @staticmethod
+    def _parse(flag_hash: str):
+        kind, _, rest = flag_hash.partition("$")
+        if kind in ("sha256", "sha256i") and rest.count("$") == 1:
+            salt, expected = rest.split("$")
+            return kind, salt, expected, None
+        if kind == "regex" and rest:
+            return kind, None, None, re.compile(rest)
+        # Legacy rows store the flag itself
+        return "plain", None, flag_hash, None
+
+    def matches(self, flag: str) -> bool:
+        if self._kind == "sha256":
+            return hmac.compare_digest(_digest(self._salt, flag), self._expected)
+        if self._kind == "sha256i":
+            return hmac.compare_digest(_digest(self._salt, flag.lower()), self._expected)
+        if self._kind == "regex":
+            return self._pattern.fullmatch(flag) is not None
+        return bool(self._expected) and hmac.compare_digest(flag.encode(), self._expected.encode())
+
+class FlagVerifierCache:
+    """In-process table of challenge id -> FlagVerifier.
+
+    Submissions are checked against this table, so the challenge row is only
+    read on a miss. Each entry remembers the challenge's version counter in
+    Redis; `invalidate()` bumps it, so every worker drops its copy on the
+    next submission. If Redis is unreachable, entries still expire after
+    `ttl` seconds.
+    """
+
+    def __init__(self, redis_client: RedisClient, ttl: int):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.prefix = "flag_verifiers:version:"
+        self._entries: dict = {}
+        self._lock = threading.Lock()
+
+    def _version(self, challenge_id: int) -> Optional[str]:
+        try:
+            return self.redis.get(f"{self.prefix}{challenge_id}") or "0"
+        except RedisError:
+            return None
+
+    async def get(self, db: AsyncSession, challenge_id: int) -> Optional[FlagVerifier]:
+        version = await run_in_threadpool(self._version, challenge_id)
+        with self._lock:
+            entry = self._entries.get(challenge_id)
+        if entry is not None and entry[0] > time.monotonic() and (version is None or entry[2] == version):
+            return entry[1]
+
+        row = (await db.execute(
+            select(
+                Challenge.id,
+                Challenge.flag_hash,
+                Challenge.flag,
+                Challenge.is_active,
+                Challenge.max_attempts,
+                Challenge.points,
+                Challenge.wave,
+                Challenge.title,
+                Challenge.dynamic_points
+            ).filter(Challenge.id == challenge_id)
+        )).first()
+        if row is None:
+            return None
+
+        verifier = FlagVerifier(row.id, row.flag_hash, row.is_active, row.max_attempts, row.points, row.wave,
+                                row.title, row.dynamic_points, legacy_flag=row.flag)
+        with self._lock:
+            self._entries[challenge_id] = (time.monotonic() + self.ttl, verifier, version)
+        return verifier
+
+    def invalidate(self, challenge_id: int):
+        with self._lock:
+            self._entries.pop(challenge_id, None)
+        try:
+            self.redis.incr(f"{self.prefix}{challenge_id}")
+        except RedisError:
+            pass
+
+# Global flag verifier table
+flag_verifiers = FlagVerifierCache(redis_client, settings.FLAG_VERIFIER_TTL)
@@ -0,0 +1,71 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from ..core.config import settings
+
+class HashingPool:
+    """Runs bcrypt off the event loop on a fixed number of threads.
+
+    bcrypt releases the GIL while hashing, so threads give real
+    parallelism. At most `workers + queue_size` jobs are admitted; beyond
+    that callers get a 503 instead of piling up behind a registration
+    storm.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        # Only touched from the event loop thread
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.hash_time_total = 0.0
+        self.hash_time_max = 0.0
+        self.wait_time_total = 0.0
+
+    async def run(self, func, *args):
+        if self.in_flight >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            result = func(*args)
+            return result, started - submitted, time.perf_counter() - started
+
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, waited, elapsed = await loop.run_in_executor(self._executor, timed)
+        finally:
+            self.in_flight -= 1
+
+        self.completed += 1
+        self.wait_time_total += waited
+        self.hash_time_total += elapsed
+        self.hash_time_max = max(self.hash_time_max, elapsed)
+        return result
+
+    def snapshot(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "queue_depth": max(self.in_flight - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "hash_avg_ms": round(self.hash_time_total / self.completed * 1000, 3) if self.completed else 0.0,
+            "hash_max_ms": round(self.hash_time_max * 1000, 3),
+            "wait_avg_ms": round(self.wait_time_total / self.completed * 1000, 3) if self.completed else 0.0,
+        }
+
+# Global hashing pool instance
+hashing_pool = HashingPool(settings.HASH_POOL_WORKERS, settings.HASH_POOL_QUEUE_SIZE)
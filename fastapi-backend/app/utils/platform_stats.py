@@ -0,0 +1,171 @@
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from redis import RedisError
+from sqlalchemy import select, func, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings
+from ..core.redis import RedisClient, redis_client
+from ..models import User, Team, Challenge, Submission, Solve
+from .scoreboard import ScoreboardCache, scoreboard_cache
+from .usernames import username_resolver
+
+logger = logging.getLogger(__name__)
+
+class PlatformStats:
+    """Platform-wide counters and recent solves kept in Redis.
+
+    `<prefix>counters` is a hash of the totals shown on the stats endpoint,
+    adjusted with HINCRBY by the routes that change them (registration, team
+    and challenge CRUD, block/unblock, solves). `<prefix>recent` is a list of
+    the latest solves, pushed and trimmed at solve time. Both are seeded from
+    the database on the first read after a flush or `reset()`, so a normal
+    read is one pipelined round trip plus the top of the scoreboard sets.
+    """
+
+    FIELDS = ("total_users", "total_teams", "total_challenges", "total_solves")
+
+    def __init__(self, redis_client: RedisClient, scoreboard: ScoreboardCache, recent_size: int):
+        self.redis = redis_client
+        self.scoreboard = scoreboard
+        self.recent_size = recent_size
+        self.prefix = "platform_stats:"
+        self.counters_key = f"{self.prefix}counters"
+        self.recent_key = f"{self.prefix}recent"
+
+    # Writes
+    def incr(self, field: str, amount: int = 1):
+        """Adjust a counter; a missed update is corrected by the next reset()"""
+        try:
+            self.redis.client.hincrby(self.counters_key, field, amount)
+        except RedisError:
+            logger.warning("Failed to update platform stat %s", field, exc_info=True)
+
+    def record_solve(self, username: str, challenge_title: Optional[str], points: int,
+                     solved_at: Optional[datetime] = None):
+        entry = {
+            "username": username,
+            "challenge_title": challenge_title,
+            "points": points,
+            "timestamp": (solved_at or datetime.utcnow()).isoformat()
+        }
+        pipe = self.redis.pipeline()
+        pipe.hincrby(self.counters_key, "total_solves", 1)
+        pipe.lpush(self.recent_key, json.dumps(entry))
+        pipe.ltrim(self.recent_key, 0, self.recent_size - 1)
+        pipe.execute()
+
+    def reset(self):
+        """Drop the rollup so the next read recounts it from the database"""
+        pipe = self.redis.pipeline()
+        pipe.delete(self.counters_key, self.recent_key)
+        pipe.execute()
+
+    # Database
+    async def _count(self, db: AsyncSession) -> Dict[str, int]:
+        row = (await db.execute(
+            select(
+                select(func.count(User.id)).filter(User.is_blocked == False).scalar_subquery(),
+                select(func.count(Team.id)).scalar_subquery(),
+                select(func.count(Challenge.id)).filter(Challenge.is_active == True).scalar_subquery(),
+                select(func.count(Solve.id)).scalar_subquery()
+            )
+        )).one()
+        return dict(zip(self.FIELDS, (int(value or 0) for value in row)))
+
+    async def _recent_from_db(self, db: AsyncSession) -> List[dict]:
+        rows = (await db.execute(
+            select(User.username, Challenge.title, Submission.points_awarded, Submission.created_at)
+            .join(User, Submission.user_id == User.id)
+            .join(Challenge, Submission.challenge_id == Challenge.id)
+            .filter(Submission.is_correct == True)
+            .order_by(desc(Submission.created_at))
+            .limit(self.recent_size)
+        )).all()
+        return [
+            {
+                "username": row.username,
+                "challenge_title": row.title,
+                "points": row.points_awarded,
+                "timestamp": row.created_at.isoformat()
+            } for row in rows
+        ]
+
+    def _store_seed(self, counters: Dict[str, int], recent: List[dict]):
+        pipe = self.redis.pipeline()
+        pipe.hset(self.counters_key, mapping={**counters, "seeded": 1})
+        if recent:
+            pipe.delete(self.recent_key)
+            pipe.rpush(self.recent_key, *(json.dumps(entry) for entry in recent))
+        pipe.execute()
+
+    async def _seed(self, db: AsyncSession, recent: List[dict]):
+        counters = await self._count(db)
+        if not recent:
+            recent = await self._recent_from_db(db)
+        await run_in_threadpool(self._store_seed, counters, recent)
+        return counters, recent
+
+    # Reads
+    def _read(self):
+        """Counters, recent solves and both leaders in one blocking call, for the threadpool"""
+        pipe = self.redis.pipeline()
+        pipe.hgetall(self.counters_key)
+        pipe.lrange(self.recent_key, 0, self.recent_size - 1)
+        raw_counters, raw_recent = pipe.execute()
+        users = self.scoreboard.top(self.scoreboard.users_key(), 1)
+        teams = self.scoreboard.top(self.scoreboard.teams_key(), 1)
+        return raw_counters, raw_recent, users, teams
+
+    async def _top(self, db: AsyncSession, users: list, teams: list):
+        top_user = {"username": None, "points": 0}
+        top_team = {"name": None, "points": 0}
+        if users:
+            user_id, points, _, _ = users[0]
+            names = await username_resolver.resolve_async(db, [user_id])
+            top_user = {"username": names.get(user_id), "points": points}
+        if teams:
+            team_id, points, _, _ = teams[0]
+            name = await db.scalar(select(Team.name).filter(Team.id == team_id))
+            top_team = {"name": name, "points": points}
+        return top_user, top_team
+
+    async def _top_from_db(self, db: AsyncSession):
+        user = (await db.execute(
+            select(User.username, User.points).filter(User.is_blocked == False)
+            .order_by(desc(User.points)).limit(1)
+        )).first()
+        team = (await db.execute(
+            select(Team.name, Team.total_points).order_by(desc(Team.total_points)).limit(1)
+        )).first()
+        return (
+            {"username": user.username if user else None, "points": user.points if user else 0},
+            {"name": team.name if team else None, "points": team.total_points if team else 0}
+        )
+
+    async def snapshot(self, db: AsyncSession) -> dict:
+        try:
+            raw_counters, raw_recent, users, teams = await run_in_threadpool(self._read)
+            recent = [json.loads(entry) for entry in raw_recent]
+            if "seeded" in raw_counters:
+                counters = {field: int(raw_counters.get(field, 0)) for field in self.FIELDS}
+            else:
+                counters, recent = await self._seed(db, recent)
+            top_user, top_team = await self._top(db, users, teams)
+        except RedisError:
+            logger.warning("Platform stats unavailable, counting from the database", exc_info=True)
+            counters = await self._count(db)
+            recent = await self._recent_from_db(db)
+            top_user, top_team = await self._top_from_db(db)
+
+        return {
+            **counters,
+            "top_user": top_user,
+            "top_team": top_team,
+            "recent_activity": recent
+        }
+
+# Global platform stats instance
+platform_stats = PlatformStats(redis_client, scoreboard_cache, settings.STATS_RECENT_ACTIVITY)
@@ -0,0 +1,116 @@
+import time
+import uuid
+from typing import Optional
+from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from redis import RedisError
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings
+from ..core.redis import RedisClient, redis_client, rate_limiter
+from ..models import Submission, User
+from .auth import get_current_user_async
+
+def _submission_allowed(user_id: int, team_id: Optional[int], challenge_id: int, window: int) -> bool:
+    limits = [(f"ratelimit:submit:user:{user_id}:{challenge_id}", settings.SUBMIT_RATE_LIMIT_USER)]
+    if team_id:
+        limits.append((f"ratelimit:submit:team:{team_id}:{challenge_id}", settings.SUBMIT_RATE_LIMIT_TEAM))
+
+    member = f"{time.time()}:{uuid.uuid4().hex[:8]}"
+    accepted = []
+    for key, limit in limits:
+        try:
+            if not rate_limiter.is_allowed_sliding(key, limit, window, member):
+                for accepted_key in accepted:
+                    rate_limiter.release_sliding(accepted_key, member)
+                return False
+        except RedisError:
+            return True
+        accepted.append(key)
+    return True
+
+async def limit_flag_submissions(challenge_id: int, current_user: User = Depends(get_current_user_async)):
+    """Sliding-window limit on /challenges/{id}/submit, per user and per team.
+
+    Only accepted submissions are logged: a hit over either limit is
+    dropped from both windows. Fails open when Redis is unavailable so
+    submissions keep working. The Redis round trips run in the threadpool.
+    """
+    window = settings.SUBMIT_RATE_LIMIT_WINDOW
+    if not await run_in_threadpool(_submission_allowed, current_user.id, current_user.team_id, challenge_id, window):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many submissions, slow down",
+            headers={"Retry-After": str(window)},
+        )
+
+class AttemptCounter:
+    """Per-user, per-challenge attempt counts kept in Redis.
+
+    A counter is seeded from the submissions table the first time it is
+    needed and incremented atomically afterwards, so enforcing max_attempts
+    no longer runs a COUNT(*) on every submission.
+    """
+
+    def __init__(self, redis_client: RedisClient, ttl: int = 86400):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.prefix = "attempts:"
+
+    def _key(self, user_id: int, challenge_id: int) -> str:
+        return f"{self.prefix}{user_id}:{challenge_id}"
+
+    def _claim(self, key: str, max_attempts: int, seed: Optional[int] = None) -> Optional[bool]:
+        """Take an attempt from the counter; None when it must be seeded first"""
+        if seed is not None:
+            self.redis.client.set(key, seed, ex=self.ttl, nx=True)
+        elif not self.redis.exists(key):
+            return None
+        if self.redis.incr(key) > max_attempts:
+            self.redis.client.decr(key)
+            return False
+        self.redis.expire(key, self.ttl)
+        return True
+
+    async def reserve(self, db: AsyncSession, user_id: int, challenge_id: int, max_attempts: int) -> bool:
+        """Claim one attempt; False when max_attempts is already used up.
+
+        The Redis round trips run in the threadpool; the counter is only
+        seeded from the submissions table when it does not exist yet.
+        """
+        key = self._key(user_id, challenge_id)
+        claimed = await run_in_threadpool(self._claim, key, max_attempts)
+        if claimed is None:
+            count = await db.scalar(
+                select(func.count(Submission.id)).filter(
+                    Submission.user_id == user_id,
+                    Submission.challenge_id == challenge_id
+                )
+            )
+            claimed = await run_in_threadpool(self._claim, key, max_attempts, count or 0)
+        return claimed
+
+    def release(self, user_id: int, challenge_id: int):
+        """Give back an attempt whose submission was not recorded"""
+        self.redis.client.decr(self._key(user_id, challenge_id))
+
+class TokenBucket:
+    """In-process token bucket for limits scoped to one connection"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def consume(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+# Global attempt counter instance
+attempt_counter = AttemptCounter(redis_client)
@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from redis import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..core.redis import RedisClient, redis_client
+
+class ResponseCache:
+    """Pre-serialized JSON responses, versioned by a counter bumped on change.
+
+    Bodies are cached per (version, key) in a process-local LRU and in Redis,
+    so a request between changes costs one Redis GET for the version and no
+    queries. `invalidate()` bumps the version, which orphans every entry at
+    once; orphans age out after `ttl`, which also bounds staleness for data
+    that changes without a bump. Responses carry an ETag, and a matching
+    If-None-Match gets an empty 304. Redis is only called through the
+    threadpool, so a slow Redis never blocks the event loop.
+
+    `build` gets a session the cache opens for that build alone, so a build
+    shared by concurrent misses doesn't depend on the first request's session
+    staying open. The payload must depend only on the key, never on the viewer.
+    """
+
+    def __init__(self, redis_client: RedisClient, namespace: str, ttl: int, max_size: int):
+        self.redis = redis_client
+        self.prefix = f"response_cache:{namespace}:"
+        self.version_key = f"{self.prefix}version"
+        self.ttl = ttl
+        self.max_size = max_size
+        self._local: "OrderedDict[Tuple[str, str], Tuple[float, str, bytes]]" = OrderedDict()
+        self._pending: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _etag(body: bytes) -> str:
+        return f'"{hashlib.sha1(body).hexdigest()}"'
+
+    def invalidate(self):
+        self.redis.incr(self.version_key)
+
+    def _version(self) -> Optional[str]:
+        try:
+            return self.redis.get(self.version_key) or "0"
+        except RedisError:
+            return None
+
+    def _get_shared(self, redis_key: str) -> Optional[str]:
+        try:
+            return self.redis.client.get(redis_key)
+        except RedisError:
+            return None
+
+    def _set_shared(self, redis_key: str, body: str):
+        try:
+            self.redis.set(redis_key, body, expire=self.ttl)
+        except RedisError:
+            pass
+
+    @staticmethod
+    async def _build(build: Callable[[AsyncSession], Awaitable[Any]]) -> str:
+        async with AsyncSessionLocal() as db:
+            return json.dumps(jsonable_encoder(await build(db)), separators=(",", ":"))
+
+    # Local LRU
+    def _get_local(self, cache_key: Tuple[str, str]) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            entry = self._local.get(cache_key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._local[cache_key]
+                return None
+            self._local.move_to_end(cache_key)
+            return entry[1], entry[2]
+
+    def _set_local(self, cache_key: Tuple[str, str], etag: str, body: bytes):
+        with self._lock:
+            self._local[cache_key] = (time.monotonic() + self.ttl, etag, body)
+            self._local.move_to_end(cache_key)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+
+    async def _load(self, version: str, key: str,
+                    build: Callable[[AsyncSession], Awaitable[Any]]) -> Tuple[str, bytes]:
+        cache_key = (version, key)
+        entry = self._get_local(cache_key)
+        if entry is not None:
+            return entry
+
+        redis_key = f"{self.prefix}{version}:{key}"
+        body = await run_in_threadpool(self._get_shared, redis_key)
+        if body is None:
+            body = await self._build(build)
+            await run_in_threadpool(self._set_shared, redis_key, body)
+        body = body.encode()
+        entry = (self._etag(body), body)
+        self._set_local(cache_key, *entry)
+        return entry
+
+    async def respond(self, request: Request, key: str,
+                      build: Callable[[AsyncSession], Awaitable[Any]]) -> Response:
+        """Serve `key` from the cache, calling `build(db)` for the payload on a miss"""
+        version = await run_in_threadpool(self._version)
+
+        if version is None:
+            body = (await self._build(build)).encode()
+            etag = self._etag(body)
+        else:
+            # Concurrent misses for one key in this worker share a single build
+            cache_key = (version, key)
+            pending = self._pending.get(cache_key)
+            if pending is None:
+                pending = asyncio.ensure_future(self._load(version, key, build))
+                self._pending[cache_key] = pending
+                pending.add_done_callback(lambda _: self._pending.pop(cache_key, None))
+            etag, body = await asyncio.shield(pending)
+
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+# Global scoreboard response cache instance
+scoreboard_responses = ResponseCache(
+    redis_client,
+    "scoreboard",
+    settings.SCOREBOARD_CACHE_TTL,
+    settings.SCOREBOARD_CACHE_SIZE,
+)
@@ -0,0 +1,283 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from ..core.redis import RedisClient, redis_client
+from ..models import User, Challenge, Submission, ScoreHistory
+
+class ScoreboardCache:
+    """Materialized scoreboard kept in Redis sorted sets.
+
+    Each board is a sorted set of entity id -> points, with two companion
+    hashes holding the solve count and last solve timestamp used for
+    tie-breaking. Boards exist globally, per team (members) and per wave.
+    Team boards keep the points earned while a user was on the team, even
+    after the user is blocked (as teams.total_points does); individual and
+    member boards hold each unblocked user's total.
+    """
+
+    def __init__(self, redis_client: RedisClient):
+        self.redis = redis_client
+        self.prefix = "scoreboard:"
+
+    # Key layout
+    def users_key(self, wave: Optional[str] = None) -> str:
+        return f"{self.prefix}wave:{wave}:users" if wave else f"{self.prefix}users"
+
+    def teams_key(self, wave: Optional[str] = None) -> str:
+        return f"{self.prefix}wave:{wave}:teams" if wave else f"{self.prefix}teams"
+
+    def team_members_key(self, team_id: int) -> str:
+        return f"{self.prefix}team:{team_id}:users"
+
+    def waves_key(self) -> str:
+        return f"{self.prefix}waves"
+
+    def _owned_patterns(self) -> List[str]:
+        # Other features (e.g. the live pusher) keep state under this prefix too
+        return [f"{self.prefix}users*", f"{self.prefix}teams*", f"{self.prefix}team:*",
+                f"{self.prefix}wave:*", self.waves_key()]
+
+    def _solves_key(self, board_key: str) -> str:
+        return f"{board_key}:solves"
+
+    def _last_solve_key(self, board_key: str) -> str:
+        return f"{board_key}:last_solve"
+
+    def _user_meta_board(self, board_key: str) -> str:
+        # Per-team member boards share the global user solve metadata
+        if board_key.startswith(f"{self.prefix}team:"):
+            return self.users_key()
+        return board_key
+
+    # Writes
+    def _add_to_board(self, pipe, board_key: str, entity_id: int, points: int, solves: int, timestamp: int):
+        pipe.zincrby(board_key, points, entity_id)
+        pipe.hincrby(self._solves_key(board_key), entity_id, solves)
+        pipe.hset(self._last_solve_key(board_key), entity_id, timestamp)
+
+    def record_solve(self, user_id: int, team_id: Optional[int], wave: Optional[str],
+                     points: int, solved_at: Optional[datetime] = None,
+                     repriced: Sequence[Tuple[int, Optional[int]]] = (), delta: int = 0):
+        """Apply a single correct solve to every board it affects.
+
+        `repriced` lists the (user_id, team_id) of earlier solvers whose solve
+        of the same challenge changed value by `delta`; they are shifted in the
+        same MULTI/EXEC, so readers never see the new solve without the decay.
+        """
+        timestamp = int((solved_at or datetime.utcnow()).timestamp())
+        pipe = self.redis.pipeline()
+        for solver_id, solver_team_id in repriced if delta else ():
+            pipe.zincrby(self.users_key(), delta, solver_id)
+            if solver_team_id:
+                pipe.zincrby(self.teams_key(), delta, solver_team_id)
+                pipe.zincrby(self.team_members_key(solver_team_id), delta, solver_id)
+            if wave:
+                pipe.zincrby(self.users_key(wave), delta, solver_id)
+                if solver_team_id:
+                    pipe.zincrby(self.teams_key(wave), delta, solver_team_id)
+        self._add_to_board(pipe, self.users_key(), user_id, points, 1, timestamp)
+        if team_id:
+            self._add_to_board(pipe, self.teams_key(), team_id, points, 1, timestamp)
+            pipe.zincrby(self.team_members_key(team_id), points, user_id)
+        if wave:
+            pipe.sadd(self.waves_key(), wave)
+            self._add_to_board(pipe, self.users_key(wave), user_id, points, 1, timestamp)
+            if team_id:
+                self._add_to_board(pipe, self.teams_key(wave), team_id, points, 1, timestamp)
+        pipe.execute()
+
+    def adjust_team(self, team_id: int, points: int):
+        """Apply a points change that isn't a solve (e.g. a paid hint) to the team board"""
+        self.redis.zincrby(self.teams_key(), points, team_id)
+
+    def move_user(self, user_id: int, old_team_id: Optional[int], new_team_id: Optional[int]):
+        """Move a user's entry between member boards when they change teams"""
+        points = self.redis.zscore(self.users_key(), user_id)
+        pipe = self.redis.pipeline()
+        if old_team_id:
+            pipe.zrem(self.team_members_key(old_team_id), user_id)
+        if new_team_id and points is not None:
+            pipe.zadd(self.team_members_key(new_team_id), {user_id: points})
+        pipe.execute()
+
+    def remove_team(self, team_id: int):
+        """Drop a deleted team from every team board"""
+        waves = self.redis.client.smembers(self.waves_key())
+        pipe = self.redis.pipeline()
+        for board_key in [self.teams_key()] + [self.teams_key(wave) for wave in waves]:
+            pipe.zrem(board_key, team_id)
+            pipe.hdel(self._solves_key(board_key), team_id)
+            pipe.hdel(self._last_solve_key(board_key), team_id)
+        pipe.delete(self.team_members_key(team_id))
+        pipe.execute()
+
+    def remove_user(self, user_id: int, team_id: Optional[int] = None):
+        """Drop a user from every individual board (e.g. when blocked); team boards keep their points"""
+        waves = self.redis.client.smembers(self.waves_key())
+        pipe = self.redis.pipeline()
+        for board_key in [self.users_key()] + [self.users_key(wave) for wave in waves]:
+            pipe.zrem(board_key, user_id)
+            pipe.hdel(self._solves_key(board_key), user_id)
+            pipe.hdel(self._last_solve_key(board_key), user_id)
+        if team_id:
+            pipe.zrem(self.team_members_key(team_id), user_id)
+        pipe.execute()
+
+    def restore_user(self, db: Session, user_id: int):
+        """Re-add a single user's solves to the individual boards"""
+        current_team_id = db.query(User.team_id).filter(User.id == user_id).scalar()
+        pipe = self.redis.pipeline()
+        for _, team_id, wave, points, solves, last_solve, _ in self._solve_totals(db, user_id):
+            timestamp = int(last_solve.timestamp()) if last_solve else 0
+            self._add_to_board(pipe, self.users_key(), user_id, points, solves, timestamp)
+            if current_team_id:
+                pipe.zincrby(self.team_members_key(current_team_id), points, user_id)
+            if wave:
+                pipe.sadd(self.waves_key(), wave)
+                self._add_to_board(pipe, self.users_key(wave), user_id, points, solves, timestamp)
+        pipe.execute()
+
+    def _solve_totals(self, db: Session, user_id: Optional[int] = None):
+        query = db.query(
+            Submission.user_id,
+            Submission.team_id,
+            Challenge.wave,
+            func.sum(Submission.points_awarded),
+            func.count(Submission.id),
+            func.max(Submission.created_at),
+            User.is_blocked
+        ).join(Challenge, Submission.challenge_id == Challenge.id)\
+         .join(User, Submission.user_id == User.id)\
+         .filter(Submission.is_correct == True)
+        if user_id is not None:
+            query = query.filter(Submission.user_id == user_id)
+        return query.group_by(Submission.user_id, Submission.team_id, Challenge.wave, User.is_blocked).all()
+
+    def rebuild(self, db: Session) -> int:
+        """Regenerate every board from the submissions table.
+
+        Returns the number of (user, team, wave) solve groups applied.
+        """
+        rows = self._solve_totals(db)
+
+        # Aggregate per board in memory so each member is written once
+        boards: Dict[str, Dict[int, List[int]]] = {}
+
+        def accumulate(board_key: str, entity_id: int, points: int, solves: int, timestamp: int):
+            entry = boards.setdefault(board_key, {}).setdefault(entity_id, [0, 0, 0])
+            entry[0] += points
+            entry[1] += solves
+            entry[2] = max(entry[2], timestamp)
+
+        waves = set()
+        for user_id, team_id, wave, points, solves, last_solve, is_blocked in rows:
+            points = int(points or 0)
+            timestamp = int(last_solve.timestamp()) if last_solve else 0
+            # Blocked users leave the individual boards but not their team's total
+            if not is_blocked:
+                accumulate(self.users_key(), user_id, points, solves, timestamp)
+            if team_id:
+                accumulate(self.teams_key(), team_id, points, solves, timestamp)
+            if wave:
+                waves.add(wave)
+                if not is_blocked:
+                    accumulate(self.users_key(wave), user_id, points, solves, timestamp)
+                if team_id:
+                    accumulate(self.teams_key(wave), team_id, points, solves, timestamp)
+
+        # Paid hints are the only team adjustments not reflected in submissions
+        adjustments = db.query(ScoreHistory.team_id, func.sum(ScoreHistory.delta))\
+            .filter(ScoreHistory.team_id != None, ScoreHistory.reason.like("hint:%"))\
+            .group_by(ScoreHistory.team_id).all()
+        for team_id, points in adjustments:
+            accumulate(self.teams_key(), team_id, int(points or 0), 0, 0)
+
+        # Member boards follow current membership
+        users = boards.get(self.users_key(), {})
+        memberships = db.query(User.id, User.team_id)\
+            .filter(User.team_id != None, User.is_blocked == False).all()
+        for user_id, team_id in memberships:
+            if user_id in users:
+                boards.setdefault(self.team_members_key(team_id), {})[user_id] = users[user_id]
+
+        stale = [key for pattern in self._owned_patterns() for key in self.redis.client.scan_iter(match=pattern)]
+        pipe = self.redis.pipeline()
+        if stale:
+            pipe.delete(*stale)
+        for board_key, members in boards.items():
+            pipe.zadd(board_key, {entity_id: entry[0] for entity_id, entry in members.items()})
+            if board_key.startswith(f"{self.prefix}team:"):
+                continue
+            pipe.hset(self._solves_key(board_key), mapping={entity_id: entry[1] for entity_id, entry in members.items()})
+            pipe.hset(self._last_solve_key(board_key), mapping={entity_id: entry[2] for entity_id, entry in members.items()})
+        if waves:
+            pipe.sadd(self.waves_key(), *waves)
+        pipe.execute()
+        return len(rows)
+
+    # Reads
+    def top(self, board_key: str, limit: int) -> List[Tuple[int, int, int, Optional[datetime]]]:
+        """Return up to `limit` (id, points, solves, last_solve) tuples in rank order.
+
+        Ties on points are broken by solves, then by the most recent solve,
+        so the window is widened to include every member tied with the last
+        entry before sorting.
+        """
+        if limit <= 0:
+            return []
+        entries = self.redis.zrevrange(board_key, 0, limit - 1, withscores=True)
+        if len(entries) == limit:
+            boundary = entries[-1][1]
+            ties = self.redis.zrevrangebyscore(board_key, boundary, boundary, withscores=True)
+            entries = [entry for entry in entries if entry[1] > boundary] + ties
+        if not entries:
+            return []
+
+        ids = [member for member, _ in entries]
+        meta_board = self._user_meta_board(board_key)
+        solves = self.redis.hmget(self._solves_key(meta_board), ids)
+        last_solves = self.redis.hmget(self._last_solve_key(meta_board), ids)
+
+        ranked = []
+        for (member, score), solve_count, last_solve in zip(entries, solves, last_solves):
+            ranked.append((int(member), int(score), int(solve_count or 0), int(last_solve or 0)))
+        ranked.sort(key=lambda entry: (entry[1], entry[2], entry[3]), reverse=True)
+
+        return [
+            (entity_id, points, solve_count, datetime.fromtimestamp(timestamp) if timestamp else None)
+            for entity_id, points, solve_count, timestamp in ranked[:limit]
+        ]
+
+    def top_users(self, limit: int, wave: Optional[str] = None, team_id: Optional[int] = None):
+        if wave and team_id:
+            raise ValueError("There is no per-team board within a wave")
+        board_key = self.team_members_key(team_id) if team_id else self.users_key(wave)
+        return self.top(board_key, limit)
+
+    def top_teams(self, limit: int, wave: Optional[str] = None):
+        return self.top(self.teams_key(wave), limit)
+
+    def rank(self, board_key: str, entity_id: int) -> Optional[int]:
+        """1-based rank by points alone, O(log n)"""
+        position = self.redis.zrevrank(board_key, entity_id)
+        return position + 1 if position is not None else None
+
+# Global scoreboard cache instance
+scoreboard_cache = ScoreboardCache(redis_client)
+
+if __name__ == "__main__":
+    # python -m app.utils.scoreboard rebuild
+    import sys
+    from ..core.database import SessionLocal
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("usage: python -m app.utils.scoreboard rebuild")
+        sys.exit(1)
+
+    db = SessionLocal()
+    try:
+        groups = scoreboard_cache.rebuild(db)
+        print(f"Rebuilt scoreboard from {groups} solve groups")
+    finally:
+        db.close()
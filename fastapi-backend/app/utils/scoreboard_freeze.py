@@ -0,0 +1,136 @@
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.redis import RedisClient, redis_client
+from ..models import User, Team
+from .scoreboard import ScoreboardCache, scoreboard_cache
+
+class ScoreboardFreeze:
+    """Frozen copies of the public scoreboard, one JSON blob per scope.
+
+    A scope is "global" or "wave:<name>". `freeze()` captures the full user
+    and team rankings of a scope from the Redis boards, with display names
+    resolved, and stores them under `scoreboard_freeze:<scope>`:
+
+        {"frozen_at": iso, "wave": name|null,
+         "individual": [[id, username, team_id, team_name, points, solves, last_solve], ...],
+         "teams": [[id, name, member_count, points, solves, last_solve], ...]}
+
+    The global blob also carries the /stats payload ("stats") and the /waves
+    payload ("waves") as they stood at the freeze; a wave blob carries its
+    own entry of the latter ("wave_stats").
+
+    While a blob exists the public endpoints render from it rather than the
+    live boards. Freezing globally also freezes every known wave.
+    """
+
+    def __init__(self, redis_client: RedisClient, scoreboard: ScoreboardCache):
+        self.redis = redis_client
+        self.scoreboard = scoreboard
+        self.prefix = "scoreboard_freeze:"
+
+    def _key(self, wave: Optional[str] = None) -> str:
+        return f"{self.prefix}wave:{wave}" if wave else f"{self.prefix}global"
+
+    # Capture
+    async def _individual(self, db: AsyncSession, wave: Optional[str]) -> List[list]:
+        board_key = self.scoreboard.users_key(wave)
+        entries = self.scoreboard.top(board_key, self.redis.client.zcard(board_key))
+        ids = [entry[0] for entry in entries]
+        users = {
+            row.id: row for row in (await db.execute(
+                select(User.id, User.username, User.team_id, Team.name.label('team_name'))
+                .outerjoin(Team, User.team_id == Team.id)
+                .filter(User.id.in_(ids), User.is_blocked == False)
+            )).all()
+        } if ids else {}
+        return [
+            [user_id, users[user_id].username, users[user_id].team_id, users[user_id].team_name,
+             points, solves, last_solve.isoformat() if last_solve else None]
+            for user_id, points, solves, last_solve in entries if user_id in users
+        ]
+
+    async def _teams(self, db: AsyncSession, wave: Optional[str]) -> List[list]:
+        board_key = self.scoreboard.teams_key(wave)
+        entries = self.scoreboard.top(board_key, self.redis.client.zcard(board_key))
+        ids = [entry[0] for entry in entries]
+        teams = {
+            row.id: row for row in (await db.execute(
+                select(Team.id, Team.name, func.count(User.id).label('member_count'))
+                .join(User, Team.id == User.team_id)
+                .filter(Team.id.in_(ids), User.is_blocked == False)
+                .group_by(Team.id, Team.name)
+            )).all()
+        } if ids else {}
+        return [
+            [team_id, teams[team_id].name, teams[team_id].member_count,
+             points, solves, last_solve.isoformat() if last_solve else None]
+            for team_id, points, solves, last_solve in entries if team_id in teams
+        ]
+
+    @staticmethod
+    def _frozen_stats(stats: dict, individual: List[list], teams: List[list]) -> dict:
+        # Leaders come from the captured rankings so they agree with the frozen boards
+        return {
+            **stats,
+            "top_user": {"username": individual[0][1] if individual else None,
+                         "points": individual[0][4] if individual else 0},
+            "top_team": {"name": teams[0][1] if teams else None,
+                         "points": teams[0][3] if teams else 0},
+        }
+
+    async def freeze(self, db: AsyncSession, wave: Optional[str] = None, stats: Optional[dict] = None,
+                     waves: Optional[Dict[str, dict]] = None) -> List[str]:
+        """Capture and store the rankings of a scope; returns the scopes frozen.
+
+        `stats` and `waves` are the current /stats and /waves payloads.
+        """
+        scopes = [wave] if wave else [None] + sorted(self.redis.client.smembers(self.scoreboard.waves_key()))
+        frozen_at = datetime.utcnow().isoformat()
+        pipe = self.redis.pipeline()
+        for scope in scopes:
+            individual = await self._individual(db, scope)
+            teams = await self._teams(db, scope)
+            artifact = {
+                "frozen_at": frozen_at,
+                "wave": scope,
+                "individual": individual,
+                "teams": teams,
+            }
+            if scope is None:
+                artifact["stats"] = self._frozen_stats(stats or {}, individual, teams)
+                artifact["waves"] = waves or {}
+            else:
+                artifact["wave_stats"] = (waves or {}).get(scope)
+            pipe.set(self._key(scope), json.dumps(artifact, separators=(",", ":")))
+        pipe.execute()
+        return [f"wave:{scope}" if scope else "global" for scope in scopes]
+
+    def unfreeze(self, wave: Optional[str] = None):
+        """Drop a scope's blob; without a wave, drop every frozen scope"""
+        keys = [self._key(wave)] if wave else list(self.redis.client.scan_iter(match=f"{self.prefix}*"))
+        if keys:
+            self.redis.client.delete(*keys)
+
+    # Reads
+    def load(self, wave: Optional[str] = None) -> Optional[dict]:
+        raw = self.redis.get(self._key(wave))
+        return json.loads(raw) if raw else None
+
+    def load_waves(self, waves: List[str]) -> Dict[str, dict]:
+        """Blobs of the given waves that are frozen, in one round trip"""
+        if not waves:
+            return {}
+        raws = self.redis.client.mget([self._key(wave) for wave in waves])
+        return {wave: json.loads(raw) for wave, raw in zip(waves, raws) if raw}
+
+    def is_frozen(self, wave: Optional[str] = None) -> bool:
+        return bool(self.redis.exists(self._key(wave)))
+
+    def scopes(self) -> List[str]:
+        return sorted(key[len(self.prefix):] for key in self.redis.client.scan_iter(match=f"{self.prefix}*"))
+
+# Global scoreboard freeze instance
+scoreboard_freeze = ScoreboardFreeze(redis_client, scoreboard_cache)
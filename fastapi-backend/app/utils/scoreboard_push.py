@@ -0,0 +1,164 @@
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from redis import RedisError
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..core.redis import RedisClient, redis_client
+from ..models import Team
+from .broadcast import ConnectionManager, manager
+from .scoreboard import ScoreboardCache, scoreboard_cache
+from .scoreboard_freeze import ScoreboardFreeze, scoreboard_freeze
+from .usernames import username_resolver
+
+logger = logging.getLogger(__name__)
+
+class ScoreboardPusher:
+    """Pushes the live scoreboard to sockets subscribed to the "scoreboard" topic.
+
+    Subscribers get a snapshot of the top `limit` users and teams, then
+    `scoreboard_delta` frames listing only the entries whose points changed:
+    {"id", "old_rank", "new_rank", "points"}, where old_rank is None (and a
+    "name" is included) for a new entry, and new_rank is None for one that
+    fell off the board.
+    Clients move each entry by id and shift the ones in between.
+
+    Correct solves only mark the board dirty. Once per `interval`, one worker
+    (whichever takes the lock) diffs the boards against the last pushed state
+    and publishes at most one frame per board, however many solves landed.
+    While the global scoreboard is frozen, subscribers get the frozen ranking
+    and pushes are held until it is unfrozen.
+    """
+
+    BOARDS = ("individual", "teams")
+
+    def __init__(self, redis_client: RedisClient, scoreboard: ScoreboardCache,
+                 manager: ConnectionManager, freeze: ScoreboardFreeze, interval: float, limit: int):
+        self.redis = redis_client
+        self.scoreboard = scoreboard
+        self.manager = manager
+        self.freeze = freeze
+        self.interval = interval
+        self.limit = limit
+        self.prefix = f"{scoreboard.prefix}push:"
+        self._task: Optional[asyncio.Task] = None
+
+    def _board_key(self, board: str) -> str:
+        return self.scoreboard.users_key() if board == "individual" else self.scoreboard.teams_key()
+
+    def _last_key(self, board: str) -> str:
+        return f"{self.prefix}last:{board}"
+
+    def mark_dirty(self):
+        self.redis.set(f"{self.prefix}dirty", 1)
+
+    async def _names(self, board: str, ids: List[int]) -> Dict[int, str]:
+        if not ids:
+            return {}
+        async with AsyncSessionLocal() as db:
+            if board == "individual":
+                return await username_resolver.resolve_async(db, ids)
+            rows = (await db.execute(select(Team.id, Team.name).filter(Team.id.in_(ids)))).all()
+            return {team_id: name for team_id, name in rows}
+
+    def _ranked(self, board: str) -> List[List[int]]:
+        return [[entity_id, points] for entity_id, points, _, _ in self.scoreboard.top(self._board_key(board), self.limit)]
+
+    async def snapshot(self) -> dict:
+        frame = {"type": "scoreboard_snapshot"}
+        frozen = await run_in_threadpool(self.freeze.load)
+        if frozen is not None:
+            frame["frozen_at"] = frozen["frozen_at"]
+            frame["individual"] = [
+                {"rank": rank, "id": row[0], "name": row[1], "points": row[4]}
+                for rank, row in enumerate(frozen["individual"][:self.limit], 1)
+            ]
+            frame["teams"] = [
+                {"rank": rank, "id": row[0], "name": row[1], "points": row[3]}
+                for rank, row in enumerate(frozen["teams"][:self.limit], 1)
+            ]
+            return frame
+        for board in self.BOARDS:
+            ranked = await run_in_threadpool(self._ranked, board)
+            names = await self._names(board, [entity_id for entity_id, _ in ranked])
+            frame[board] = [
+                {"rank": rank, "id": entity_id, "name": names.get(entity_id), "points": points}
+                for rank, (entity_id, points) in enumerate(ranked, 1)
+            ]
+        return frame
+
+    async def _diff(self, board: str) -> List[dict]:
+        ranked = self._ranked(board)
+        raw = self.redis.get(self._last_key(board))
+        previous = {entity_id: (rank, points) for rank, (entity_id, points) in enumerate(json.loads(raw) if raw else [], 1)}
+        self.redis.set(self._last_key(board), ranked)
+
+        deltas = []
+        current = set()
+        for rank, (entity_id, points) in enumerate(ranked, 1):
+            current.add(entity_id)
+            old_rank, old_points = previous.get(entity_id, (None, None))
+            if old_points != points:
+                deltas.append({"id": entity_id, "old_rank": old_rank, "new_rank": rank, "points": points})
+        for entity_id, (old_rank, old_points) in previous.items():
+            if entity_id not in current:
+                deltas.append({"id": entity_id, "old_rank": old_rank, "new_rank": None, "points": old_points})
+
+        names = await self._names(board, [delta["id"] for delta in deltas if delta["old_rank"] is None])
+        for delta in deltas:
+            if delta["old_rank"] is None:
+                delta["name"] = names.get(delta["id"])
+        return deltas
+
+    async def tick(self):
+        lock_ms = max(int(self.interval * 1000), 1)
+        if not self.redis.client.set(f"{self.prefix}lock", 1, nx=True, px=lock_ms):
+            return
+        if self.freeze.is_frozen():
+            # Leave the dirty flag set so the first tick after unfreezing catches up
+            return
+        pipe = self.redis.pipeline()
+        pipe.get(f"{self.prefix}dirty")
+        pipe.delete(f"{self.prefix}dirty")
+        dirty, _ = pipe.execute()
+        if not dirty:
+            return
+        for board in self.BOARDS:
+            deltas = await self._diff(board)
+            if deltas:
+                await self.manager.publish_topic({"type": "scoreboard_delta", "board": board, "deltas": deltas}, "scoreboard")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.tick()
+            except (RedisError, SQLAlchemyError):
+                logger.warning("Scoreboard push failed", exc_info=True)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Global scoreboard pusher instance
+scoreboard_pusher = ScoreboardPusher(
+    redis_client,
+    scoreboard_cache,
+    manager,
+    scoreboard_freeze,
+    settings.SCOREBOARD_PUSH_INTERVAL,
+    settings.SCOREBOARD_PUSH_LIMIT,
+)
@@ -0,0 +1,145 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from redis import RedisError
+from ..core.config import settings
+from ..core.redis import RedisClient, redis_client
+
+class TokenCache:
+    """Bounded LRU of token digest -> verified claims.
+
+    Entries are only served until the token's own `exp`, so a cached token
+    never outlives the signature check it replaced.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        digest = self._digest(token)
+        with self._lock:
+            claims = self._entries.get(digest)
+            if claims is None:
+                return None
+            if claims.get("exp", 0) <= time.time():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return claims
+
+    def set(self, token: str, claims: dict):
+        digest = self._digest(token)
+        with self._lock:
+            self._entries[digest] = claims
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+class BloomFilter:
+    def __init__(self, size_bits: int = 1 << 20, hashes: int = 5):
+        self.size_bits = size_bits
+        self.hashes = hashes
+        self.bits = bytearray(size_bits // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.sha256(item.encode()).digest()
+        for i in range(self.hashes):
+            yield int.from_bytes(digest[i * 4:i * 4 + 4], "big") % self.size_bits
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position // 8] & (1 << (position % 8)) for position in self._positions(item))
+
+class RevocationList:
+    """Denylist of revoked token ids (jti) and blocked users, stored in Redis.
+
+    Each worker keeps a bloom filter of revoked jtis, refreshed from Redis
+    every `sync_interval` seconds, so a clean token costs no round trip and
+    a possible hit costs exactly one. User revocations (block/delete) are
+    mirrored locally in full and compared against the token's `iat`; both
+    are fractional seconds, so a token issued just after a revocation within
+    the same second stays valid.
+    Revocations made on another worker take effect within one sync interval.
+    """
+
+    def __init__(self, redis_client: RedisClient, sync_interval: int, token_lifetime: int):
+        self.redis = redis_client
+        self.sync_interval = sync_interval
+        self.token_lifetime = token_lifetime
+        self.jti_key = "auth:revoked_jti"      # sorted set jti -> exp
+        self.users_key = "auth:revoked_users"  # sorted set user id -> revoked_at
+        self._bloom = BloomFilter()
+        self._revoked_users: dict = {}
+        self._last_sync = 0.0
+        self._lock = threading.Lock()
+
+    def revoke_token(self, jti: str, exp: int):
+        # The local filter is updated first: while Redis is unreachable a
+        # bloom hit counts as revoked, so this worker rejects the token anyway
+        with self._lock:
+            self._bloom.add(jti)
+        self.redis.client.zadd(self.jti_key, {jti: exp})
+
+    def revoke_user(self, user_id: int):
+        """Revoke every token issued to the user up to now"""
+        revoked_at = time.time()
+        # Local state first, so this worker revokes even if Redis is unreachable
+        with self._lock:
+            self._revoked_users[str(user_id)] = revoked_at
+        self.redis.client.zadd(self.users_key, {str(user_id): revoked_at})
+
+    def sync(self):
+        now = int(time.time())
+        pipe = self.redis.pipeline()
+        pipe.zremrangebyscore(self.jti_key, "-inf", now)
+        pipe.zremrangebyscore(self.users_key, "-inf", now - self.token_lifetime)
+        pipe.zrange(self.jti_key, 0, -1)
+        pipe.zrange(self.users_key, 0, -1, withscores=True)
+        _, _, jtis, users = pipe.execute()
+
+        bloom = BloomFilter(self._bloom.size_bits, self._bloom.hashes)
+        for jti in jtis:
+            bloom.add(jti)
+        with self._lock:
+            self._bloom = bloom
+            self._revoked_users = {user_id: float(revoked_at) for user_id, revoked_at in users}
+            self._last_sync = time.monotonic()
+
+    def is_revoked(self, claims: dict) -> bool:
+        if time.monotonic() - self._last_sync > self.sync_interval:
+            try:
+                self.sync()
+            except RedisError:
+                # Keep serving from the last synced state while Redis is unavailable
+                self._last_sync = time.monotonic()
+
+        revoked_at = self._revoked_users.get(str(claims.get("uid")))
+        if revoked_at is not None and claims.get("iat", 0) <= revoked_at:
+            return True
+
+        jti = claims.get("jti")
+        if jti is None or jti not in self._bloom:
+            return False
+        try:
+            return self.redis.zscore(self.jti_key, jti) is not None
+        except RedisError:
+            return True
+
+# Global token cache and revocation list instances
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE)
+revocation_list = RevocationList(
+    redis_client,
+    settings.REVOCATION_SYNC_INTERVAL,
+    settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
@@ -0,0 +1,171 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from redis import RedisError
+from sqlalchemy import Enum, DateTime, event
+from sqlalchemy.orm import Session, make_transient_to_detached
+from ..core.config import settings
+from ..core.redis import RedisClient, redis_client
+from ..models import User
+from .usernames import username_resolver
+
+class UserCache:
+    """Short-TTL cache of authenticated users keyed by user id.
+
+    Column values are kept in a per-process LRU in front of Redis, so most
+    requests rebuild the User without touching the database. Cached users
+    are handed out detached and merged into the request session with
+    load=False, which attaches them without a SELECT. The password hash is
+    never cached; it stays unloaded and is only read from the database.
+
+    Each user has a version counter in Redis that `invalidate()` bumps. A
+    local entry is only served while its version matches, so a change made
+    on one worker is seen by every worker on the next request. The version
+    is read in the same round trip as the Redis entry; if Redis is
+    unreachable, local entries still expire after `ttl` seconds.
+    """
+
+    EXCLUDED_COLUMNS = ("password_hash",)
+
+    def __init__(self, redis_client: RedisClient, ttl: int, max_size: int):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.max_size = max_size
+        self.prefix = "user_cache:"
+        self.version_prefix = "user_cache:version:"
+        self._local: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._columns = {
+            column.key: column.type for column in User.__table__.columns
+            if column.key not in self.EXCLUDED_COLUMNS
+        }
+
+    def _key(self, user_id: int) -> str:
+        return f"{self.prefix}{user_id}"
+
+    def _version_key(self, user_id: int) -> str:
+        return f"{self.version_prefix}{user_id}"
+
+    # Serialization
+    def _dump(self, user: User) -> dict:
+        data = {}
+        for key in self._columns:
+            value = getattr(user, key)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            elif hasattr(value, "value"):
+                value = value.value
+            data[key] = value
+        return data
+
+    def _load(self, data: dict) -> User:
+        values = {}
+        for key, column_type in self._columns.items():
+            value = data.get(key)
+            if value is not None and isinstance(column_type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif value is not None and isinstance(column_type, Enum) and column_type.enum_class:
+                value = column_type.enum_class(value)
+            values[key] = value
+        user = User(**values)
+        make_transient_to_detached(user)
+        return user
+
+    # Local LRU
+    def _get_local(self, user_id: int, version: Optional[str]) -> Optional[dict]:
+        """Local entry for the user; a None version (Redis down) skips the version check"""
+        with self._lock:
+            entry = self._local.get(user_id)
+            if entry is None:
+                return None
+            expires_at, data, entry_version = entry
+            if expires_at < time.monotonic() or (version is not None and entry_version != version):
+                del self._local[user_id]
+                return None
+            self._local.move_to_end(user_id)
+            return data
+
+    def _set_local(self, user_id: int, data: dict, version: Optional[str]):
+        with self._lock:
+            self._local[user_id] = (time.monotonic() + self.ttl, data, version)
+            self._local.move_to_end(user_id)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+
+    def get(self, user_id: int) -> Optional[User]:
+        """Return a detached User, or None on a miss"""
+        try:
+            version, raw = self.redis.client.mget(self._version_key(user_id), self._key(user_id))
+            version = version or "0"
+        except RedisError:
+            version, raw = None, None
+        data = self._get_local(user_id, version)
+        if data is None:
+            if raw is None:
+                return None
+            data = json.loads(raw)
+            self._set_local(user_id, data, version)
+        return self._load(data)
+
+    def set(self, user: User):
+        data = self._dump(user)
+        try:
+            version = self.redis.get(self._version_key(user.id)) or "0"
+            self.redis.set(self._key(user.id), data, expire=self.ttl)
+        except RedisError:
+            version = None
+        self._set_local(user.id, data, version)
+
+    def _bump(self, user_ids):
+        # Version keys only need to outlive the local entries they invalidate
+        pipe = self.redis.pipeline()
+        pipe.delete(*(self._key(user_id) for user_id in user_ids))
+        for user_id in user_ids:
+            pipe.incr(self._version_key(user_id))
+            pipe.expire(self._version_key(user_id), self.ttl)
+        pipe.execute()
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._local.pop(user_id, None)
+        try:
+            self._bump([user_id])
+        except RedisError:
+            pass
+
+    def invalidate_many(self, user_ids):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        with self._lock:
+            for user_id in user_ids:
+                self._local.pop(user_id, None)
+        try:
+            self._bump(user_ids)
+        except RedisError:
+            pass
+
+# Global user cache instance
+user_cache = UserCache(redis_client, settings.USER_CACHE_TTL, settings.USER_CACHE_SIZE)
+
+# Any flushed change to a User (profile edits, block/unblock, deletes, points
+# awarded on solve) evicts it once the transaction commits.
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    changed = session.info.setdefault("changed_user_ids", set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            changed.add(obj.id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop("changed_user_ids", ()):
+        user_cache.invalidate(user_id)
+        username_resolver.invalidate(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session):
+    session.info.pop("changed_user_ids", None)
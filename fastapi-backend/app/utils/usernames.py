@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..models import User
+
+class UsernameResolver:
+    """LRU map of user id -> username shared by routes that render user names.
+
+    Misses are fetched together in one `WHERE id IN (...)` query, so a page
+    of N rows costs at most one lookup instead of one per row. Entries are
+    evicted when the user row changes in this process (see utils.user_cache)
+    and expire after `ttl` seconds, which bounds how long another worker
+    keeps showing an old name.
+    """
+
+    def __init__(self, ttl: int, max_size: int = 50000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._names: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _split(self, user_ids: Iterable[Optional[int]]):
+        found, missing = {}, set()
+        now = time.monotonic()
+        with self._lock:
+            for user_id in user_ids:
+                if user_id is None or user_id in found:
+                    continue
+                entry = self._names.get(user_id)
+                if entry is None or entry[0] < now:
+                    missing.add(user_id)
+                else:
+                    self._names.move_to_end(user_id)
+                    found[user_id] = entry[1]
+        return found, missing
+
+    def _store(self, rows) -> Dict[int, str]:
+        resolved = {}
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for user_id, username in rows:
+                self._names[user_id] = (expires_at, username)
+                self._names.move_to_end(user_id)
+                resolved[user_id] = username
+            while len(self._names) > self.max_size:
+                self._names.popitem(last=False)
+        return resolved
+
+    def resolve(self, db: Session, user_ids: Iterable[Optional[int]]) -> Dict[int, str]:
+        found, missing = self._split(user_ids)
+        if missing:
+            found.update(self._store(db.execute(select(User.id, User.username).filter(User.id.in_(missing))).all()))
+        return found
+
+    async def resolve_async(self, db: AsyncSession, user_ids: Iterable[Optional[int]]) -> Dict[int, str]:
+        found, missing = self._split(user_ids)
+        if missing:
+            rows = (await db.execute(select(User.id, User.username).filter(User.id.in_(missing)))).all()
+            found.update(self._store(rows))
+        return found
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._names.pop(user_id, None)
+
+# Global username resolver instance
+username_resolver = UsernameResolver(settings.USERNAME_CACHE_TTL)
@@ -0,0 +1,152 @@
+"""Concurrent load generator for the API.
+
+Fires a mix of scoreboard reads and flag submissions at a running server and
+reports requests/sec and latency percentiles per endpoint. Run it against the
+same database before and after a change to compare throughput:
+
+    pip install httpx
+    python loadtest.py --base-url http://localhost:8000 --token <jwt> \
+        --challenge-id 1 --concurrency 200 --requests 5000
+
+With --check-counters it instead has every token in --tokens-file (one JWT
+per line, one per player) submit wrong flags and then the correct --flag all
+at once, and verifies the challenge's attempts/solves moved by exactly the
+number of accepted submissions:
+
+    python loadtest.py --check-counters --tokens-file tokens.txt \
+        --challenge-id 1 --flag 'CTF{...}' --wrong-per-user 3
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import defaultdict
+
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def worker(client, queue, results, args):
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    while True:
+        try:
+            index = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        # Interleave reads and writes so slow reads can stall submissions
+        if args.challenge_id and index % args.submit_every == 0:
+            name = "submit"
+            request = client.post(
+                f"/api/challenges/{args.challenge_id}/submit",
+                json={"flag": f"wrong-{index}"},
+                headers=headers,
+            )
+        else:
+            name = "scoreboard"
+            request = client.get("/api/scoreboard/individual", params={"limit": 50})
+
+        start = time.perf_counter()
+        try:
+            response = await request
+            ok = response.status_code < 500
+        except httpx.HTTPError:
+            ok = False
+        results[name].append((time.perf_counter() - start, ok))
+
+
+async def fetch_counters(client, args, headers):
+    response = await client.get(f"/api/challenges/{args.challenge_id}", headers=headers)
+    response.raise_for_status()
+    challenge = response.json()
+    return challenge["attempts"], challenge["solves"]
+
+
+async def check_counters(args):
+    with open(args.tokens_file) as handle:
+        tokens = [line.strip() for line in handle if line.strip()]
+    if not tokens:
+        raise SystemExit("no tokens in --tokens-file")
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        probe = {"Authorization": f"Bearer {tokens[0]}"}
+        attempts_before, solves_before = await fetch_counters(client, args, probe)
+
+        async def submit(token, flag):
+            response = await client.post(
+                f"/api/challenges/{args.challenge_id}/submit",
+                json={"flag": flag},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            return response.json().get("message") if response.status_code == 200 else None
+
+        jobs = []
+        for token in tokens:
+            jobs.extend(submit(token, f"wrong-{i}") for i in range(args.wrong_per_user))
+            jobs.append(submit(token, args.flag))
+        start = time.perf_counter()
+        messages = await asyncio.gather(*jobs)
+        elapsed = time.perf_counter() - start
+
+        attempts_after, solves_after = await fetch_counters(client, args, probe)
+
+    # Only these responses reach the counter updates; "Already solved" and
+    # "Max attempts reached" return before anything is counted
+    correct = messages.count("Correct flag!")
+    incorrect = messages.count("Incorrect flag")
+    expected_attempts = correct + incorrect
+
+    print(f"{len(jobs)} submissions from {len(tokens)} users in {elapsed:.2f}s")
+    print(f"  attempts: +{attempts_after - attempts_before} (expected +{expected_attempts})")
+    print(f"  solves:   +{solves_after - solves_before} (expected +{correct})")
+    if attempts_after - attempts_before != expected_attempts or solves_after - solves_before != correct:
+        raise SystemExit("FAIL: lost or duplicated counter updates")
+    print("OK: counters are exact")
+
+
+async def run(args):
+    queue = asyncio.Queue()
+    for index in range(args.requests):
+        queue.put_nowait(index)
+
+    results = defaultdict(list)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client, queue, results, args) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    total = sum(len(samples) for samples in results.values())
+    print(f"{total} requests in {elapsed:.2f}s -> {total / elapsed:.1f} req/s (concurrency {args.concurrency})")
+    for name, samples in sorted(results.items()):
+        latencies = [latency * 1000 for latency, _ in samples]
+        errors = sum(1 for _, ok in samples if not ok)
+        print(
+            f"  {name:<10} n={len(samples):<6} errors={errors:<4} "
+            f"mean={statistics.mean(latencies):.1f}ms p50={percentile(latencies, 50):.1f}ms "
+            f"p95={percentile(latencies, 95):.1f}ms p99={percentile(latencies, 99):.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", default="", help="JWT used for flag submissions")
+    parser.add_argument("--challenge-id", type=int, default=0, help="challenge to submit wrong flags to")
+    parser.add_argument("--submit-every", type=int, default=5, help="one submission per N requests")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--check-counters", action="store_true", help="verify attempts/solves under concurrency")
+    parser.add_argument("--tokens-file", default="", help="one JWT per line, used by --check-counters")
+    parser.add_argument("--flag", default="", help="correct flag, used by --check-counters")
+    parser.add_argument("--wrong-per-user", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(check_counters(args) if args.check_counters else run(args))
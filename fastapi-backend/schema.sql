@@ -85,6 +85,18 @@ CREATE TABLE submissions (
   INDEX (user_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- solves (one row per user per solved challenge)
+CREATE TABLE solves (
+  id BIGINT PRIMARY KEY AUTO_INCREMENT,
+  user_id BIGINT NOT NULL,
+  team_id BIGINT NULL,
+  challenge_id BIGINT NOT NULL,
+  solved_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE KEY uq_solves_user_challenge (user_id, challenge_id),
+  INDEX ix_solves_challenge (challenge_id),
+  INDEX ix_solves_team (team_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 -- score_history
 CREATE TABLE score_history (
   id BIGINT PRIMARY KEY AUTO_INCREMENT,
@@ -92,7 +104,8 @@ CREATE TABLE score_history (
   delta INT,
   reason VARCHAR(255),
   created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-  INDEX (team_id)
+  INDEX (team_id),
+  INDEX ix_score_history_team_time (team_id, created_at, delta)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 -- hint_requests
@@ -123,7 +136,31 @@ CREATE TABLE chat_messages (
   created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
   deleted BOOLEAN DEFAULT FALSE,
   INDEX (team_id),
-  INDEX (user_id)
+  INDEX (user_id),
+  INDEX ix_chat_created_id (created_at, id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- conversations (one row per participant of a private conversation)
+CREATE TABLE conversations (
+  user_id BIGINT NOT NULL,
+  partner_id BIGINT NOT NULL,
+  last_message_id BIGINT NULL,
+  last_message_at DATETIME NULL,
+  unread_count INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, partner_id),
+  INDEX ix_conversations_user_last (user_id, last_message_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- wave_scores (per-wave points of each user and team, maintained on solve)
+CREATE TABLE wave_scores (
+  wave VARCHAR(100) NOT NULL,
+  entity_type VARCHAR(10) NOT NULL,
+  entity_id BIGINT NOT NULL,
+  points INT NOT NULL DEFAULT 0,
+  solves INT NOT NULL DEFAULT 0,
+  last_solve DATETIME NULL,
+  PRIMARY KEY (wave, entity_type, entity_id),
+  INDEX ix_wave_scores_rank (wave, entity_type, points, solves, last_solve)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 -- audit_logs (simple)
@@ -144,6 +181,12 @@ ALTER TABLE hints ADD CONSTRAINT fk_hints_challenge FOREIGN KEY (challenge_id) R
 ALTER TABLE submissions ADD CONSTRAINT fk_submissions_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE;
 ALTER TABLE submissions ADD CONSTRAINT fk_submissions_team FOREIGN KEY (team_id) REFERENCES teams(id) ON DELETE CASCADE;
 ALTER TABLE submissions ADD CONSTRAINT fk_submissions_challenge FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE;
+ALTER TABLE solves ADD CONSTRAINT fk_solves_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE;
+ALTER TABLE solves ADD CONSTRAINT fk_solves_team FOREIGN KEY (team_id) REFERENCES teams(id) ON DELETE SET NULL;
+ALTER TABLE solves ADD CONSTRAINT fk_solves_challenge FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE;
+ALTER TABLE conversations ADD CONSTRAINT fk_conversations_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE;
+ALTER TABLE conversations ADD CONSTRAINT fk_conversations_partner FOREIGN KEY (partner_id) REFERENCES users(id) ON DELETE CASCADE;
+ALTER TABLE conversations ADD CONSTRAINT fk_conversations_last_message FOREIGN KEY (last_message_id) REFERENCES chat_messages(id) ON DELETE SET NULL;
 ALTER TABLE hint_requests ADD CONSTRAINT fk_hintreq_team FOREIGN KEY (team_id) REFERENCES teams(id) ON DELETE CASCADE;
 ALTER TABLE hint_requests ADD CONSTRAINT fk_hintreq_challenge FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE;
 ALTER TABLE hint_requests ADD CONSTRAINT fk_hintreq_hint FOREIGN KEY (hint_id) REFERENCES hints(id) ON DELETE CASCADE;
@@ -0,0 +1,177 @@
+import asyncio
+import importlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Optional
+
+import pytest
+from sqlalchemy import Boolean, DateTime, Integer, String, Text, create_engine, event
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from app.utils import usernames
+from app.utils.usernames import UsernameResolver
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class User(Base):
+    __tablename__ = "users"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    username: Mapped[str] = mapped_column(String(50))
+
+
+class ChatMessage(Base):
+    __tablename__ = "chat_messages"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    content: Mapped[str] = mapped_column(Text)
+    message_type: Mapped[str] = mapped_column(String(20), default="chat")
+    sender_id: Mapped[int] = mapped_column(Integer)
+    recipient_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    team_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    is_private: Mapped[bool] = mapped_column(Boolean, default=False)
+    is_deleted: Mapped[bool] = mapped_column(Boolean, default=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    edited_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # Only the id/username columns are read, so a minimal table stands in for app.models.User
+    monkeypatch.setattr(usernames, "User", User)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(User(id=user_id, username=f"user{user_id}") for user_id in range(1, 101))
+        session.commit()
+        yield session
+    engine.dispose()
+
+
+@contextmanager
+def count_queries(session):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def test_resolve_batches_misses_into_one_query(db):
+    resolver = UsernameResolver(ttl=60)
+    with count_queries(db) as statements:
+        names = resolver.resolve(db, list(range(1, 101)) + [None, 1, 2])
+    assert len(statements) == 1
+    assert len(names) == 100
+    assert names[42] == "user42"
+
+
+def test_resolve_serves_cached_names_without_queries(db):
+    resolver = UsernameResolver(ttl=60)
+    resolver.resolve(db, range(1, 51))
+    with count_queries(db) as statements:
+        names = resolver.resolve(db, range(1, 51))
+    assert statements == []
+    assert len(names) == 50
+
+    with count_queries(db) as statements:
+        resolver.resolve(db, range(1, 101))
+    assert len(statements) == 1
+
+
+def test_resolve_refetches_invalidated_and_expired_names(db, monkeypatch):
+    resolver = UsernameResolver(ttl=60)
+    resolver.resolve(db, [1, 2, 3])
+    db.get(User, 1).username = "renamed"
+    db.commit()
+
+    resolver.invalidate(1)
+    with count_queries(db) as statements:
+        assert resolver.resolve(db, [1, 2, 3])[1] == "renamed"
+    assert len(statements) == 1
+
+    # Renames made on another worker are picked up once the entry expires
+    db.get(User, 2).username = "elsewhere"
+    db.commit()
+    now = usernames.time.monotonic()
+    monkeypatch.setattr(usernames.time, "monotonic", lambda: now + 61)
+    with count_queries(db) as statements:
+        assert resolver.resolve(db, [2, 3])[2] == "elsewhere"
+    assert len(statements) == 1
+
+
+def test_lru_evicts_oldest_beyond_max_size(db):
+    resolver = UsernameResolver(ttl=60, max_size=10)
+    resolver.resolve(db, range(1, 21))
+    with count_queries(db) as statements:
+        resolver.resolve(db, range(11, 21))
+    assert statements == []
+    with count_queries(db) as statements:
+        resolver.resolve(db, [1])
+    assert len(statements) == 1
+
+
+def test_message_listing_resolves_names_in_one_lookup(monkeypatch):
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    messages = importlib.import_module("app.routes.messages")
+    monkeypatch.setattr(usernames, "User", User)
+    monkeypatch.setattr(messages, "User", User)
+    monkeypatch.setattr(messages, "ChatMessage", ChatMessage)
+    monkeypatch.setattr(messages, "username_resolver", UsernameResolver(ttl=60))
+
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        start = datetime(2024, 1, 1)
+        async with AsyncSession(engine) as db:
+            db.add_all(User(id=user_id, username=f"user{user_id}") for user_id in range(1, 41))
+            # Public messages from 40 senders, plus private ones to and from the viewer
+            db.add_all(
+                ChatMessage(id=message_id, content="hi", sender_id=message_id % 40 + 1,
+                            recipient_id=1 if message_id % 5 == 0 else None,
+                            is_private=message_id % 5 == 0, created_at=start + timedelta(seconds=message_id))
+                for message_id in range(1, 121)
+            )
+            await db.commit()
+
+            statements = []
+
+            def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+
+            event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+            viewer = SimpleNamespace(id=1, team_id=None)
+            pages = []
+            before = None
+            for _ in range(2):
+                statements.clear()
+                page = await messages.get_messages(limit=50, before=before, since=None, message_type=None,
+                                                   current_user=viewer, db=db)
+                pages.append((page, [statement for statement in statements if "FROM users" in statement]))
+                before = page[-1].cursor
+        await engine.dispose()
+        return pages
+
+    pages = asyncio.run(run())
+    first, first_lookups = pages[0]
+    assert len(first) == 50
+    assert len(first_lookups) == 1
+    assert first[0].sender_username == f"user{120 % 40 + 1}"
+    assert first[0].recipient_username == "user1"
+    # The second page's senders were all resolved by the first page
+    second, second_lookups = pages[1]
+    assert len(second) == 50
+    assert second_lookups == []
@@ -0,0 +1,111 @@
+"""WebSocket fan-out benchmark.
+
+Connects simulated sockets to an in-process ConnectionManager, broadcasts a
+stream of chat messages to all of them and reports fan-out time, per-socket
+delivery latency and how many stalled clients were dropped:
+
+    python wsbench.py --sockets 5000 --messages 300 --stalled 50
+
+Each simulated socket takes --send-ms per frame. The --stalled ones never
+finish a send, so they fill their queue (or hit WS_SEND_TIMEOUT) and are
+disconnected instead of holding up everyone else. Messages go through Redis
+pub/sub when REDIS_URL is reachable and are delivered locally otherwise.
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from app.core.config import settings
+from app.core.redis import redis_client
+from app.utils.broadcast import ConnectionManager
+
+
+class SimulatedSocket:
+    def __init__(self, send_delay, stalled=False):
+        self.send_delay = send_delay
+        self.stalled = stalled
+        self.received = 0
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, payload):
+        if self.stalled:
+            await asyncio.Event().wait()
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+        self.received += 1
+
+    async def close(self, code=1000):
+        self.closed = True
+
+
+def redis_available():
+    try:
+        return redis_client.client.ping()
+    except Exception:
+        return False
+
+
+async def run(args):
+    manager = ConnectionManager(
+        redis_client,
+        settings.REDIS_URL,
+        args.queue_size,
+        settings.WS_SEND_TIMEOUT,
+        settings.PRESENCE_HEARTBEAT_INTERVAL,
+        settings.PRESENCE_TTL,
+        prefix="wsbench",
+    )
+    via_redis = redis_available()
+    if via_redis:
+        manager.start()
+        await asyncio.sleep(0.5)
+
+    sockets = []
+    for index in range(args.sockets):
+        socket = SimulatedSocket(args.send_ms / 1000, stalled=index < args.stalled)
+        await manager.connect(socket, index + 1)
+        sockets.append(socket)
+    healthy = sockets[args.stalled:]
+
+    message = {"message_type": "text", "content": "x" * args.size, "sender_username": "bench"}
+    start = time.perf_counter()
+    for index in range(args.messages):
+        await manager.broadcast({**message, "id": index})
+        await asyncio.sleep(args.interval_ms / 1000)
+
+    # Wait until every healthy client has received everything
+    deadline = time.perf_counter() + 60
+    while any(socket.received < args.messages for socket in healthy) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    await manager.stop()
+
+    complete = sum(1 for socket in healthy if socket.received == args.messages)
+    stats = manager.metrics.snapshot()
+    print(f"{args.sockets} sockets, {args.messages} messages in {elapsed:.2f}s "
+          f"({'redis pub/sub' if via_redis else 'local delivery'})")
+    print(f"  deliveries  {stats['deliveries']} ({complete}/{len(healthy)} healthy clients got every message)")
+    print(f"  fan-out     avg={stats['fanout_avg_ms']}ms max={stats['fanout_max_ms']}ms per message")
+    print(f"  delivery    p50={stats['delivery_p50_ms']}ms p95={stats['delivery_p95_ms']}ms "
+          f"p99={stats['delivery_p99_ms']}ms")
+    print(f"  dropped     {stats['dropped_clients']} of {args.stalled} stalled clients, "
+          f"{stats['send_errors']} send errors")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sockets", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--interval-ms", type=float, default=5.0, help="pause between broadcasts")
+    parser.add_argument("--size", type=int, default=200, help="message content length")
+    parser.add_argument("--send-ms", type=float, default=0.0, help="per-frame send time of healthy clients")
+    parser.add_argument("--stalled", type=int, default=50, help="clients that never finish a send")
+    parser.add_argument("--queue-size", type=int, default=settings.WS_SEND_QUEUE_SIZE)
+    args = parser.parse_args()
+    # Without Redis every publish falls back to local delivery; don't log each one
+    logging.getLogger("app.utils.broadcast").setLevel(logging.ERROR)
+    asyncio.run(run(args))